@@ -1,2 +1,12 @@
 
 # Initialize agents package
+from importlib import import_module
+
+_AGENTS = ('ci_agent', 'deploy_agent', 'helm_agent')
+
+
+def __getattr__(name):
+    # Agent packages are only imported when first accessed
+    if name in _AGENTS:
+        return import_module(f'{__name__}.{name}')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
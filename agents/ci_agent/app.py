@@ -1,32 +1,48 @@
-import sys
 import os
+import tempfile
+import threading
 from flask import Blueprint, Flask
 from agents.utils.logger import setup_agent_logger
-from agents.ci_agent.repo_analyzer import RepoAnalyzer
-from prometheus_flask_exporter import PrometheusMetrics
-import logging
+from agents.utils.database import database_uri, engine_options
+from agents.utils.json_provider import ORJSONProvider
+from agents.utils.server import run_app
 from agents.ci_agent.routes import register_routes
 
 logger = setup_agent_logger('ci-agent')
 
+DEFAULT_LLM_URL = 'http://localhost:8000/v1'
+
+# LLM_PROVIDER -> resolver returning the RepoAnalyzer llm_url, or None when
+# the provider is not configured
+_LLM_PROVIDERS = {
+    'openai': lambda env: f"openai:{env['OPENAI_API_KEY']}" if env.get('OPENAI_API_KEY') else None,
+    'gemini': lambda env: (
+        f"{env.get('GEMINI_URL', 'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent')}"
+        f"?key={env['GEMINI_API_KEY']}"
+    ) if env.get('GEMINI_API_KEY') else None,
+    'other': lambda env: env.get('CUSTOM_LLM_URL'),
+}
+
+def _resolve_llm_url(env):
+    """
+    Picks the LLM URL for the configured provider, falling back to CUSTOM_LLM_URL
+    """
+    resolver = _LLM_PROVIDERS.get(env.get('LLM_PROVIDER', 'openai').lower(), _LLM_PROVIDERS['other'])
+    return resolver(env) or env.get('CUSTOM_LLM_URL', DEFAULT_LLM_URL)
+
 def create_app():
     app = Flask(__name__)
+    app.json = ORJSONProvider(app)
     
     # Database configuration
-    database_url = os.environ.get('DATABASE_URL')
-    if database_url and database_url.startswith('postgres://'):
-        database_url = database_url.replace('postgres://', 'postgresql://', 1)
-
-    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'pool_recycle': 300,
-        'pool_pre_ping': True,
-        'connect_args': {
-            'sslmode': 'require' if os.environ.get('POSTGRES_SSL', 'true').lower() == 'true' else 'prefer'
-        }
-    }
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options()
     
+    # Heavy imports are deferred until an app is actually built
+    from prometheus_flask_exporter import PrometheusMetrics
+    from agents.ci_agent.repo_analyzer import RepoAnalyzer
+
     # Initialize metrics with a unique registry name to avoid collisions
     metrics = PrometheusMetrics(app, registry_name='ci_agent_registry')
     metrics.info('app_info', 'Application info', version='1.0.0', service='ci_agent')
@@ -34,15 +50,17 @@ def create_app():
     # Initialize blueprint and routes
     blueprint = Blueprint('ci_agent', __name__)
     
-    # Use OpenAI for LLM capabilities
-    openai_api_key = os.environ.get('OPENAI_API_KEY')
-    if openai_api_key:
-        llm_url = f"openai:{openai_api_key}"
-    else:
-        # Fallback to a default URL if no API key is available
-        llm_url = os.environ.get('CUSTOM_LLM_URL', 'http://localhost:8000/v1')
+    llm_url = _resolve_llm_url(os.environ)
         
-    repo_analyzer = RepoAnalyzer(llm_url)
+    # Clones are throwaway, so keep them on tmpfs when the host has one
+    default_clone_root = '/dev/shm/ci-agent' if os.path.isdir('/dev/shm') else os.path.join(tempfile.gettempdir(), 'repos')
+    clone_root = os.environ.get('CI_CLONE_ROOT', default_clone_root)
+
+    repo_analyzer = RepoAnalyzer(llm_url, work_dir=clone_root, cache_dir=os.environ.get('CI_AGENT_CACHE_DIR'))
+    repo_analyzer.load_templates()
+
+    # Warm the LLM connection without delaying startup
+    threading.Thread(target=repo_analyzer.warm_up, name='ci-agent-warmup', daemon=True).start()
     register_routes(blueprint, repo_analyzer)
     
     # Register blueprint
@@ -50,8 +68,19 @@ def create_app():
     
     return app
 
-# Create the application instance
-app = create_app()
+# The module-level app is built on first access, so importing this module
+# (e.g. for create_app) does not pay for metrics, templates or the analyzer
+_app = None
+_app_lock = threading.Lock()
+
+def __getattr__(name):
+    global _app
+    if name == 'app':
+        with _app_lock:
+            if _app is None:
+                _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=9001)
\ No newline at end of file
+    run_app(create_app(), port=9001)
\ No newline at end of file
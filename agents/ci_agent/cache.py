@@ -0,0 +1,89 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(*parts: str) -> str:
+    """
+    Builds a stable cache key from the given string parts
+    """
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache for JSON-serializable results.
+
+    Entries are kept in memory and, when cache_dir is set, also written to
+    disk as one JSON file per key so they survive process restarts.
+    """
+
+    def __init__(self, max_entries: int = 512, cache_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value for key, or None on a miss
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = self._read_from_disk(key)
+        if value is not None:
+            self._store(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Stores value under key
+        """
+        self._store(key, value)
+        self._write_to_disk(key, value)
+
+    def _store(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_from_disk(self, key: str) -> Optional[Any]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Failed to read cache entry %s: %s", key, e)
+            return None
+
+    def _write_to_disk(self, key: str, value: Any) -> None:
+        if not self.cache_dir:
+            return
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(value, f)
+            # Atomic rename so concurrent readers never see a partial file
+            os.replace(tmp_path, self._path(key))
+        except (OSError, TypeError) as e:
+            logger.warning("Failed to write cache entry %s: %s", key, e)
@@ -1,12 +1,23 @@
+import asyncio
+import atexit
 import os
 import shutil
 import tempfile
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 import re
 import json
 import subprocess
-from typing import Optional, Dict, Any, Tuple
+import sys
+import threading
+import uuid
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+
+from agents.ci_agent.cache import ResultCache, make_key
 
 # Set up module-level logger
 logger = logging.getLogger(__name__)
@@ -14,20 +25,388 @@ logger = logging.getLogger(__name__)
 # Conditionally import optional dependencies
 git = None
 openai = None
+orjson = None
+hyperscan = None
+pygit2 = None
 
 try:
     import git
 except ImportError:
     logger.warning("GitPython not installed, falling back to subprocess for git operations")
+
+try:
+    import orjson
+except ImportError:
+    logger.warning("orjson not installed, falling back to the standard json module")
+
+try:
+    import hyperscan
+except ImportError:
+    logger.info("hyperscan not installed, matching marker files in Python")
+
+try:
+    import pygit2
+except ImportError:
+    logger.info("pygit2 not installed, reading clones with the git command")
+
+
+def _json_loads(data):
+    """
+    Parses JSON from str or bytes, using orjson when available
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj, indent: bool = False) -> str:
+    """
+    Serializes obj to a JSON string, using orjson when available
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+    return json.dumps(obj, indent=2 if indent else None)
     
+# Environment for git commands that talk to a remote: fail instead of
+# blocking on a credential prompt
+_GIT_REMOTE_ENV = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+
+def _clone_command(repo_url: str, branch: str, repo_path: str, shallow: bool, bare: bool) -> List[str]:
+    """
+    Builds the git clone argv used by RepoAnalyzer
+    """
+    clone_args = ["--depth", "1", "--single-branch", "--no-tags"] if shallow else []
+    if bare:
+        clone_args += ["--bare", "--filter=blob:none"]
+    return ["git", "-c", "protocol.version=2", "clone", *clone_args, "-b", branch, repo_url, repo_path]
+
+
+# Characters replaced with '_' when naming a clone directory after its repository
+_SANITIZE_RE = re.compile(r'[^\w\-_]')
+
+# https://github.com/<owner>/<repo>[.git], whose file list can be read from the API
+_GITHUB_URL_RE = re.compile(r'^https://github\.com/([^/]+)/([^/]+?)(?:\.git)?/?$')
+
+# Directories list_files() does not descend into: VCS metadata, dependencies
+# and build output never decide the project type
+_SKIPPED_DIRS = frozenset({
+    '.git', 'node_modules', '.venv', 'venv', '__pycache__', 'target', 'dist', 'build', '.next', '.cache',
+})
+
+# Directory holding the Jenkinsfile templates, one <project_type>.groovy per type
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+
+# Marker bits collected by _marker_flags() and tested by _detect_from_flags()
+_PACKAGE_JSON = 1 << 0
+_REACT = 1 << 1
+_VUE = 1 << 2
+_ANGULAR = 1 << 3
+_PYTHON = 1 << 4
+_DJANGO = 1 << 5
+_FLASK = 1 << 6
+_MAVEN = 1 << 7
+_GRADLE = 1 << 8
+_CSPROJ = 1 << 9
+_ASPNET_VIEWS = 1 << 10
+_INDEX_HTML = 1 << 11
+
+# Paths (relative to the repository root) that are markers on their own
+_NAME_FLAGS = {
+    'package.json': _PACKAGE_JSON,
+    'angular.json': _ANGULAR,
+    'requirements.txt': _PYTHON,
+    'setup.py': _PYTHON,
+    'pyproject.toml': _PYTHON,
+    'pom.xml': _MAVEN,
+    'build.gradle': _GRADLE,
+    'build.gradle.kts': _GRADLE,
+    'index.html': _INDEX_HTML,
+}
+
+# File extensions that are markers anywhere in the tree
+_EXTENSION_FLAGS = {
+    '.tsx': _REACT,
+    '.jsx': _REACT,
+    '.vue': _VUE,
+    '.csproj': _CSPROJ,
+    '.razor': _ASPNET_VIEWS,
+    '.cshtml': _ASPNET_VIEWS,
+}
+
+
+# Bits that can only come from root-level files, and bits any path can set
+_ROOT_FLAGS = _PACKAGE_JSON | _PYTHON | _MAVEN | _GRADLE | _INDEX_HTML
+_NESTED_FLAGS = _REACT | _VUE | _ANGULAR | _DJANGO | _FLASK | _CSPROJ | _ASPNET_VIEWS
+
+
+def _path_flags(f: str) -> int:
+    """
+    Returns the marker bits set by a single path
+    """
+    flags = _NAME_FLAGS.get(f, 0)
+
+    ext = f[f.rfind('.'):]
+    flags |= _EXTENSION_FLAGS.get(ext, 0)
+    if ext == '.json' and f.endswith('.angular.json'):
+        flags |= _ANGULAR
+    elif ext == '.py' and f.endswith('wsgi.py'):
+        flags |= _DJANGO
+
+    lower = f.lower()
+    if 'django' in lower:
+        flags |= _DJANGO
+    if 'flask' in lower:
+        flags |= _FLASK
+    return flags
+
+
+def _build_marker_database():
+    """
+    Compiles the marker rules of _path_flags() into one hyperscan database.
+    Patterns are anchored per line so a newline-joined file list is scanned once.
+    """
+    patterns = [(b'^' + re.escape(name).encode() + b'$', flag, 0) for name, flag in _NAME_FLAGS.items()]
+    patterns += [(re.escape(ext).encode() + b'$', flag, 0) for ext, flag in _EXTENSION_FLAGS.items()]
+    patterns += [
+        (rb'\.angular\.json$', _ANGULAR, 0),
+        (rb'wsgi\.py$', _DJANGO, 0),
+        (rb'django', _DJANGO, hyperscan.HS_FLAG_CASELESS),
+        (rb'flask', _FLASK, hyperscan.HS_FLAG_CASELESS),
+    ]
+
+    database = hyperscan.Database()
+    database.compile(
+        expressions=[pattern for pattern, _, _ in patterns],
+        ids=list(range(len(patterns))),
+        flags=[extra | hyperscan.HS_FLAG_MULTILINE | hyperscan.HS_FLAG_SINGLEMATCH for _, _, extra in patterns],
+        elements=len(patterns),
+    )
+    return database, tuple(flag for _, flag, _ in patterns)
+
+
+_marker_database = _build_marker_database() if hyperscan is not None else None
+# Hyperscan scratch space must not be shared between concurrent scans
+_marker_scratch = threading.local()
+
+
+def _marker_flags(file_list) -> int:
+    """
+    Collects the marker bits of a file list in a single pass
+    """
+    if _marker_database is None:
+        flags = 0
+        for f in file_list:
+            flags |= _path_flags(f)
+        return flags
+
+    database, pattern_flags = _marker_database
+    scratch = getattr(_marker_scratch, "scratch", None)
+    if scratch is None:
+        scratch = _marker_scratch.scratch = hyperscan.Scratch(database)
+
+    matched = [0]
+
+    def on_match(pattern_id, start, end, match_flags, context):
+        matched[0] |= pattern_flags[pattern_id]
+
+    data = "\n".join(file_list).encode("utf-8", "surrogateescape")
+    database.scan(data, match_event_handler=on_match, scratch=scratch)
+    return matched[0]
+
+
+class IncrementalDetector:
+    """
+    Detects the project type while paths are still being listed.
+
+    Paths must arrive with all root-level files first (RepoAnalyzer.iter_files
+    guarantees this). observe() returns True once no path still to come can
+    change the result, so the caller can stop listing.
+    """
+
+    def __init__(self):
+        self.flags = 0
+        self._root_done = False
+
+    def observe(self, path: str) -> bool:
+        if not self._root_done and '/' in path:
+            self._root_done = True
+        self.flags |= _path_flags(path)
+        return self.is_final()
+
+    def is_final(self) -> bool:
+        unseen = _NESTED_FLAGS if self._root_done else _ROOT_FLAGS | _NESTED_FLAGS
+        return _detect_from_flags(self.flags) == _detect_from_flags(self.flags | unseen)
+
+    def result(self) -> Tuple[str, float, list]:
+        project_type, confidence, build_steps = _detect_from_flags(self.flags)
+        return project_type, confidence, list(build_steps)
+
+
+@lru_cache(maxsize=512)
+def _detect_from_flags(flags: int) -> Tuple[str, float, list]:
+    """
+    Rule-based project type detection over the marker bits of a repository.
+    Returns (project_type, confidence, build_steps)
+    """
+    # Check for Node.js project
+    if flags & _PACKAGE_JSON:
+        if flags & (_REACT | _VUE):
+            # React or Vue project
+            return "node_service", 0.9, ["npm install", "npm test", "npm build"]
+        elif flags & _ANGULAR:
+            # Angular project
+            return "node_service", 0.9, ["npm install", "ng test", "ng build"]
+        else:
+            # Generic Node.js
+            return "node_service", 0.8, ["npm install", "npm test", "npm build"]
+
+    # Check for Python project
+    elif flags & _PYTHON:
+        if flags & _DJANGO:
+            # Django project
+            return "python", 0.9, ["pip install -r requirements.txt", "python manage.py test", "python manage.py collectstatic"]
+        elif flags & _FLASK:
+            # Flask project
+            return "python", 0.9, ["pip install -r requirements.txt", "pytest", "python build"]
+        else:
+            # Generic Python
+            return "python", 0.8, ["pip install -r requirements.txt", "pytest"]
+
+    # Check for Java project
+    elif flags & _MAVEN:
+        # Maven project
+        return "java", 0.9, ["mvn clean", "mvn test", "mvn package"]
+    elif flags & _GRADLE:
+        # Gradle project
+        return "java", 0.9, ["./gradlew clean", "./gradlew test", "./gradlew build"]
+
+    # Check for .NET project
+    elif flags & _CSPROJ:
+        if flags & _ASPNET_VIEWS:
+            # ASP.NET project
+            return "aspnet_service", 0.9, ["dotnet restore", "dotnet test", "dotnet build", "dotnet publish"]
+        else:
+            # Generic .NET project
+            return "csharp_library", 0.8, ["dotnet restore", "dotnet test", "dotnet build"]
+
+    # Static website
+    elif flags & _INDEX_HTML:
+        return "website", 0.7, ["npm install", "npm build"]
+
+    # Unknown project type
+    return "unknown", 0.1, []
+
+
+# Files worth showing the LLM wherever they are in the tree
+_PROMPT_NAMES = frozenset({
+    'package.json', 'pnpm-lock.yaml', 'yarn.lock', 'requirements.txt', 'pyproject.toml', 'setup.py',
+    'Pipfile', 'pom.xml', 'build.gradle', 'build.gradle.kts', 'go.mod', 'Cargo.toml', 'Dockerfile',
+    'Makefile', 'angular.json', 'tsconfig.json', 'index.html',
+})
+_PROMPT_SUFFIXES = ('.csproj', '.sln', '.razor', '.cshtml', '.tf')
+_PROMPT_SAMPLES_PER_EXTENSION = 30
+_PROMPT_MAX_FILES = 300
+
+
+def _prompt_file_list(file_list) -> List[str]:
+    """
+    Trims a file list to what the LLM needs to classify the project: shallow
+    files, manifests and build files, plus a few examples of every other
+    file extension. The result is capped at _PROMPT_MAX_FILES paths.
+    """
+    selected = []
+    samples: Dict[str, int] = {}
+    rest = []
+    for f in file_list:
+        base = f.rsplit('/', 1)[-1]
+        if f.count('/') <= 1 or base in _PROMPT_NAMES or f.endswith(_PROMPT_SUFFIXES):
+            selected.append(f)
+        else:
+            ext = os.path.splitext(base)[1]
+            if samples.get(ext, 0) < _PROMPT_SAMPLES_PER_EXTENSION:
+                samples[ext] = samples.get(ext, 0) + 1
+                rest.append(f)
+
+    return (selected + rest)[:_PROMPT_MAX_FILES]
+
+
+class _JSONObjectScanner:
+    """
+    Tracks streamed LLM text until the first top-level JSON object is closed,
+    so the rest of the generation does not have to be waited for
+    """
+
+    def __init__(self):
+        self.text = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Adds a chunk of text and returns True once the object is complete
+        """
+        for i, char in enumerate(chunk):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = self._depth > 0
+            elif char == "{":
+                self._depth += 1
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.text.append(chunk[:i + 1])
+                    return True
+        self.text.append(chunk)
+        return False
+
+    def result(self) -> str:
+        return "".join(self.text)
+
+
+# Model used for the OpenAI provider. The newest OpenAI model, released May 13, 2024
+OPENAI_MODEL = "gpt-4o"
+
+# Bump whenever the analysis prompt changes so cached LLM answers are not reused
+LLM_PROMPT_VERSION = "2"
+
 # Note: OpenAI is imported dynamically in the _analyze_with_openai method to avoid issues
 # if it's not available
 
 class RepoAnalyzer:
-    def __init__(self, llm_url: str, work_dir: str = "/tmp/repos"):
+    # Jenkinsfile templates keyed by project type, shared by all instances
+    # since the files never change at runtime; see load_templates()
+    _TEMPLATE_CACHE: Dict[str, str] = {}
+    # Same templates pre-encoded as UTF-8 for generate_jenkins_file()
+    _TEMPLATE_BYTES_CACHE: Dict[str, bytes] = {}
+
+    def __init__(self, llm_url: str, work_dir: str = "/tmp/repos", cache_dir: Optional[str] = None):
         self.llm_url = llm_url
         self.work_dir = work_dir
         self.logger = logging.getLogger(__name__)
+
+
+        # Analyses keyed by repository and commit, optionally persisted to disk
+        self._analysis_cache = ResultCache(
+            cache_dir=os.path.join(cache_dir, "analysis") if cache_dir else None
+        )
+        # Last analyzed commit of each (repository, branch), so branches never
+        # analyzed before skip the ls-remote of a cache lookup that cannot hit
+        self._branch_heads = ResultCache(
+            cache_dir=os.path.join(cache_dir, "heads") if cache_dir else None
+        )
+        # LLM answers keyed by model, prompt version and file list
+        self._llm_cache = ResultCache(
+            max_entries=1024,
+            cache_dir=os.path.join(cache_dir, "llm") if cache_dir else None
+        )
+        self.llm_cache_hits = 0
         
         # Determine LLM provider from URL prefix
         if self.llm_url.startswith("openai:"):
@@ -38,24 +417,53 @@ class RepoAnalyzer:
         else:
             self.provider = "other"
             
-        self.logger.info(f"Using LLM provider: {self.provider}")
+        self.logger.info("Using LLM provider: %s", self.provider)
+
+        # Shared HTTP session so LLM calls reuse keep-alive connections
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                # Only idempotent methods are retried on these statuses; an LLM
+                # completion POST may already have been run and billed
+                allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                raise_on_status=False
+            )
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        # OpenAI client, created lazily by _get_openai_client()
+        self._openai_client = None
+        self._openai_client_lock = threading.Lock()
+
+        # Background rm -rf processes started by cleanup()
+        self._pending_cleanups: List[subprocess.Popen] = []
+        self._cleanup_lock = threading.Lock()
+        # Let in-flight deletions finish at shutdown instead of orphaning trash directories
+        atexit.register(self.wait_for_cleanups)
 
         # Create working directory if it doesn't exist
-        if not os.path.exists(work_dir):
-            os.makedirs(work_dir)
+        os.makedirs(work_dir, exist_ok=True)
 
-    def clone_repository(self, repo_url: str, branch: str = "main") -> str:
+    def clone_repository(self, repo_url: str, branch: str = "main", shallow: bool = True,
+                         bare: bool = True) -> str:
         """
-        Clones a Git repository and returns the path to the cloned directory
+        Clones a Git repository and returns the path to the cloned directory.
+        By default only the tip of the requested branch is fetched; pass
+        shallow=False when the full history is needed.
+
+        By default the clone is bare and blobless: no working tree is written
+        and file contents are only fetched on demand through read_blob().
+        Pass bare=False to get a regular checkout.
         """
+        repo_path = None
         try:
-            # Create a unique directory name based on the repo URL
-            repo_name = re.sub(r'[^\w\-_]', '_', repo_url.split('/')[-1].replace('.git', ''))
-            repo_path = os.path.join(self.work_dir, f"{repo_name}_{tempfile.mktemp(dir='').split('/')[-1]}")
-            
-            # Remove existing directory if it exists
-            if os.path.exists(repo_path):
-                shutil.rmtree(repo_path)
+            repo_path = self._make_clone_dir(repo_url)
             
             # Check if we can use GitPython or need to fallback to subprocess
             use_git_python = False
@@ -73,52 +481,299 @@ class RepoAnalyzer:
             else:
                 use_git_python = True
                 
-            if not use_git_python:
+            if pygit2 is not None and shutil.which("git") is None:
+                # libgit2 cannot make partial clones, so it is only used without a git binary
+                self.logger.info("Cloning repository %s (branch: %s) to %s using pygit2", repo_url, branch, repo_path)
+                pygit2.clone_repository(repo_url, repo_path, bare=bare, checkout_branch=branch,
+                                        depth=1 if shallow else 0)
+            elif not use_git_python:
                 # Fallback to subprocess if GitPython is not available
-                self.logger.info(f"Cloning repository {repo_url} (branch: {branch}) to {repo_path} using subprocess")
+                self.logger.info("Cloning repository %s (branch: %s) to %s using subprocess", repo_url, branch, repo_path)
                 os.makedirs(repo_path, exist_ok=True)
                 subprocess.run(
-                    ["git", "clone", "-b", branch, repo_url, repo_path], 
+                    _clone_command(repo_url, branch, repo_path, shallow, bare),
                     check=True,
-                    capture_output=True
+                    capture_output=True,
+                    env=_GIT_REMOTE_ENV
                 )
             else:
                 # Clone the repository using GitPython
-                self.logger.info(f"Cloning repository {repo_url} (branch: {branch}) to {repo_path}")
+                self.logger.info("Cloning repository %s (branch: %s) to %s", repo_url, branch, repo_path)
+                clone_kwargs = {"depth": 1, "single_branch": True, "multi_options": ["--no-tags"]} if shallow else {}
+                if bare:
+                    clone_kwargs["bare"] = True
+                    clone_kwargs["multi_options"] = clone_kwargs.get("multi_options", []) + ["--filter=blob:none"]
+                clone_kwargs["env"] = _GIT_REMOTE_ENV
                 if git is not None:
                     # Use the module-level import
-                    git.Repo.clone_from(repo_url, repo_path, branch=branch)
+                    git.Repo.clone_from(repo_url, repo_path, branch=branch, **clone_kwargs)
                 else:
                     # Use the dynamically imported module
-                    git_module.Repo.clone_from(repo_url, repo_path, branch=branch)
+                    git_module.Repo.clone_from(repo_url, repo_path, branch=branch, **clone_kwargs)
             
-            self.logger.info(f"Repository cloned successfully to {repo_path}")
+            self.logger.info("Repository cloned successfully to %s", repo_path)
             return repo_path
             
         except Exception as e:
-            self.logger.error(f"Error cloning repository: {str(e)}")
+            self.logger.error("Error cloning repository: %s", e)
+            if repo_path:
+                shutil.rmtree(repo_path, ignore_errors=True)
             raise RuntimeError(f"Failed to clone repository: {str(e)}")
 
-    def analyze_project_type(self, repo_path: str) -> Dict[str, Any]:
+    def _make_clone_dir(self, repo_url: str) -> str:
+        """
+        Creates a unique directory under work_dir, named after the repository, to clone into
+        """
+        repo_name = _SANITIZE_RE.sub('_', repo_url.split('/')[-1].replace('.git', ''))
+        return tempfile.mkdtemp(prefix=f"{repo_name}_", dir=self.work_dir)
+
+    def clone_repositories(self, specs: List[Tuple[str, str]], max_workers: int = 4) -> Dict[str, str]:
+        """
+        Clones several (repo_url, branch) pairs concurrently and returns the
+        clone path for each repo_url. If any clone fails, the others are
+        removed and the error is raised.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="repo-clone") as executor:
+            futures = {executor.submit(self.clone_repository, repo_url, branch): repo_url
+                       for repo_url, branch in specs}
+
+        repo_paths, errors = {}, []
+        for future, repo_url in futures.items():
+            try:
+                repo_paths[repo_url] = future.result()
+            except Exception as e:
+                errors.append(e)
+
+        if errors:
+            for repo_path in repo_paths.values():
+                self.cleanup(repo_path)
+            raise errors[0]
+
+        return repo_paths
+
+    def resolve_head(self, repo_url: str, branch: str = "main", timeout: float = 30) -> Optional[str]:
+        """
+        Returns the commit SHA the remote branch points to without cloning,
+        or None if it cannot be resolved within timeout seconds
+        """
+        try:
+            result = subprocess.run(
+                ["git", "ls-remote", repo_url, f"refs/heads/{branch}"],
+                check=True,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                env=_GIT_REMOTE_ENV
+            )
+        except (subprocess.SubprocessError, OSError) as e:
+            self.logger.warning("Failed to resolve %s on %s: %s", branch, repo_url, e)
+            return None
+
+        return result.stdout.split("\t", 1)[0].strip() or None
+
+    def get_head_sha(self, repo_path: str) -> Optional[str]:
+        """
+        Returns the commit SHA checked out in a cloned repository
+        """
+        if pygit2 is not None:
+            try:
+                return str(pygit2.Repository(repo_path).head.target)
+            except (pygit2.GitError, KeyError) as e:
+                self.logger.debug("pygit2 could not read HEAD of %s: %s", repo_path, e)
+
+        try:
+            result = subprocess.run(
+                ["git", "-C", repo_path, "rev-parse", "HEAD"],
+                check=True,
+                capture_output=True,
+                text=True
+            )
+        except (subprocess.SubprocessError, OSError) as e:
+            self.logger.warning("Failed to read HEAD of %s: %s", repo_path, e)
+            return None
+
+        return result.stdout.strip() or None
+
+    def get_cached_analysis(self, repo_url: str, commit_sha: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Returns a previous analysis of repo_url at commit_sha, if any
+        """
+        if not commit_sha:
+            return None
+        return self._analysis_cache.get(make_key(repo_url, commit_sha))
+
+    def cache_analysis(self, repo_url: str, commit_sha: Optional[str], analysis: Dict[str, Any],
+                       branch: Optional[str] = None) -> None:
+        """
+        Remembers the analysis of repo_url at commit_sha, and that branch was
+        analyzed if it is given
+        """
+        # Failed or inconclusive analyses are not cached so they get retried
+        if not commit_sha or "error" in analysis or analysis.get("project_type") == "unknown":
+            return
+        self._analysis_cache.set(make_key(repo_url, commit_sha), analysis)
+        if branch is not None:
+            self._branch_heads.set(make_key(repo_url, branch), commit_sha)
+
+    def has_cached_branch(self, repo_url: str, branch: str) -> bool:
+        """
+        Returns True if an analysis of the branch was cached before, at any commit
+        """
+        return self._branch_heads.get(make_key(repo_url, branch)) is not None
+
+    @staticmethod
+    def supports_remote_listing(repo_url: str) -> bool:
+        """
+        Returns True if list_remote_files() can try to list repo_url without a clone
+        """
+        return _GITHUB_URL_RE.match(repo_url) is not None
+
+    @staticmethod
+    def _is_bare_repository(repo_path: str) -> bool:
+        """
+        Returns True if repo_path is a bare repository (no working tree)
+        """
+        return (not os.path.exists(os.path.join(repo_path, ".git"))
+                and os.path.isfile(os.path.join(repo_path, "HEAD"))
+                and os.path.isdir(os.path.join(repo_path, "objects")))
+
+    def list_files(self, repo_path: str) -> List[str]:
+        """
+        Returns the repository file paths relative to its root. Bare
+        repositories are listed from the HEAD tree without touching blobs.
+        """
+        return list(self.iter_files(repo_path))
+
+    def iter_files(self, repo_path: str) -> Iterator[str]:
+        """
+        Yields the repository file paths relative to its root, all
+        root-level files before anything in a subdirectory
+        """
+        if self._is_bare_repository(repo_path) and pygit2 is not None:
+            # Walk the tree objects in-process, breadth-first so root files come first
+            trees = [("", pygit2.Repository(repo_path).head.peel(pygit2.Tree))]
+            for prefix, tree in trees:
+                for entry in tree:
+                    if entry.type_str == "tree":
+                        trees.append((f"{prefix}{entry.name}/", entry))
+                    else:
+                        yield f"{prefix}{entry.name}"
+            return
+
+        if self._is_bare_repository(repo_path):
+            result = subprocess.run(
+                ["git", "--git-dir", repo_path, "ls-tree", "-r", "--name-only", "HEAD"],
+                check=True,
+                capture_output=True,
+                text=True
+            )
+            # ls-tree sorts by full path; stable-sort root files to the front
+            yield from sorted(result.stdout.splitlines(), key=lambda path: '/' in path)
+            return
+
+        # Depth-first from the root, so the root directory is always read first
+        prefix_len = len(os.path.join(repo_path, ""))
+        stack = [repo_path]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    # DirEntry.is_dir uses the d_type from the directory read, no stat
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in _SKIPPED_DIRS:
+                            stack.append(entry.path)
+                    else:
+                        yield entry.path[prefix_len:]
+
+    def list_remote_files(self, repo_url: str, branch: str = "main") -> Optional[List[str]]:
+        """
+        Returns the file paths on a remote branch without cloning, or None
+        when the host does not support it and the caller has to clone
+        """
+        match = _GITHUB_URL_RE.match(repo_url)
+        if not match:
+            return None
+
+        owner, repo = match.groups()
+        headers = {"Accept": "application/vnd.github+json"}
+        if os.environ.get("GITHUB_TOKEN"):
+            headers["Authorization"] = f"Bearer {os.environ['GITHUB_TOKEN']}"
+
+        try:
+            response = self._session.get(
+                f"https://api.github.com/repos/{owner}/{repo}/git/trees/{branch}",
+                params={"recursive": "1"},
+                headers=headers,
+                timeout=10
+            )
+            response.raise_for_status()
+            tree = _json_loads(response.content)
+        except Exception as e:
+            self.logger.warning("Failed to list %s via the GitHub API: %s", repo_url, e)
+            return None
+
+        # Very large trees come back truncated; a clone gives the full list
+        if tree.get("truncated"):
+            return None
+
+        return [entry["path"] for entry in tree.get("tree", []) if entry.get("type") == "blob"]
+
+    def read_blob(self, repo_path: str, path: str) -> Optional[str]:
+        """
+        Returns the content of a file at HEAD, or None if it does not exist.
+        Works for both bare clones and regular checkouts.
+        """
+        if not self._is_bare_repository(repo_path):
+            file_path = os.path.join(repo_path, path)
+            if not os.path.isfile(file_path):
+                return None
+            with open(file_path, "r", errors="replace") as f:
+                return f.read()
+
+        if pygit2 is not None:
+            try:
+                return pygit2.Repository(repo_path).revparse_single(f"HEAD:{path}").data.decode("utf-8", "replace")
+            except (KeyError, pygit2.GitError):
+                # Not present locally; blobless clones need git to fetch it on demand
+                pass
+
+        result = subprocess.run(
+            ["git", "--git-dir", repo_path, "cat-file", "-p", f"HEAD:{path}"],
+            capture_output=True,
+            text=True,
+            errors="replace"
+        )
+        if result.returncode != 0:
+            return None
+        return result.stdout
+
+    def analyze_project_type(self, repo_path: Optional[str] = None,
+                             file_list: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Analyzes the repository and determines project type based on files present.
-        Falls back to LLM analysis if available.
+        Falls back to LLM analysis if available. Pass file_list instead of
+        repo_path when the paths are already known.
         """
         try:
-            # Get list of files in repository
-            file_list = []
-            for root, _, files in os.walk(repo_path):
-                for file in files:
-                    file_path = os.path.relpath(os.path.join(root, file), repo_path)
-                    # Skip .git directory files 
-                    if not file_path.startswith('.git/'):
-                        file_list.append(file_path)
+            if file_list is None:
+                # Detect while listing and stop as soon as the result is settled
+                detector = IncrementalDetector()
+                file_list = []
+                for path in self.iter_files(repo_path):
+                    file_list.append(path)
+                    if detector.observe(path):
+                        break
+                project_type, confidence, build_steps = detector.result()
+            else:
+                # Rule-based project type detection
+                project_type, confidence, build_steps = self._detect_project_type(file_list)
 
             # Log file list for debugging
-            self.logger.debug(f"Repository files:\n{json.dumps(file_list, indent=2)}")
-            
-            # Rule-based project type detection
-            project_type, confidence, build_steps = self._detect_project_type(file_list)
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Repository files:\n%s", _json_dumps(file_list, indent=True))
             
             # Only use LLM if rule-based detection has low confidence
             if confidence < 0.7:
@@ -136,11 +791,12 @@ class RepoAnalyzer:
                 "build_steps": build_steps
             }
             
-            self.logger.info(f"Analysis result: {json.dumps(analysis, indent=2)}")
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("Analysis result: %s", _json_dumps(analysis, indent=True))
             return analysis
 
         except Exception as e:
-            self.logger.error(f"Failed to analyze repository: {str(e)}")
+            self.logger.error("Failed to analyze repository: %s", e)
             # Return a default analysis with error information
             return {
                 "project_type": "unknown",
@@ -149,68 +805,116 @@ class RepoAnalyzer:
                 "error": str(e)
             }
     
+    async def analyze_async(self, repo_url: str, branch: str = "main") -> Dict[str, Any]:
+        """
+        Clones and analyzes a repository without blocking the event loop.
+        Paths are read from git as it lists them and the listing is stopped
+        as soon as the rules settle; the LLM call, when needed, runs in a thread.
+        """
+        repo_path = self._make_clone_dir(repo_url)
+        try:
+            clone = await asyncio.create_subprocess_exec(
+                *_clone_command(repo_url, branch, repo_path, shallow=True, bare=True),
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+                env=_GIT_REMOTE_ENV
+            )
+            _, stderr = await clone.communicate()
+            if clone.returncode != 0:
+                raise RuntimeError(f"Failed to clone repository: {stderr.decode(errors='replace').strip()}")
+
+            detector = IncrementalDetector()
+            file_list = []
+            # Root entries first (the detector relies on it), then the rest of the tree
+            for args in (["ls-tree", "HEAD"], ["ls-tree", "-r", "HEAD"]):
+                nested = "-r" in args
+                listing = await asyncio.create_subprocess_exec(
+                    "git", "--git-dir", repo_path, *args,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                settled = False
+                async for line in listing.stdout:
+                    # "<mode> <type> <object>\t<path>"; only files count, not
+                    # directories (tree) or submodules (commit)
+                    entry, _, path = line.decode("utf-8", "surrogateescape").rstrip("\n").partition("\t")
+                    if entry.split(" ", 2)[1:2] != ["blob"]:
+                        continue
+                    if nested and "/" not in path:
+                        continue
+                    file_list.append(path)
+                    if detector.observe(path):
+                        settled = True
+                        break
+                if settled and listing.returncode is None:
+                    listing.kill()
+                    await listing.wait()
+                    break
+                stderr = await listing.stderr.read()
+                if await listing.wait() != 0:
+                    raise RuntimeError(f"Failed to list repository: {stderr.decode(errors='replace').strip()}")
+                if settled:
+                    break
+
+            project_type, confidence, build_steps = detector.result()
+            if confidence < 0.7:
+                llm_project_type, llm_confidence, llm_build_steps = await asyncio.to_thread(
+                    self._analyze_with_llm, file_list
+                )
+                if llm_confidence > confidence:
+                    project_type, confidence, build_steps = llm_project_type, llm_confidence, llm_build_steps
+
+            return {"project_type": project_type, "confidence": confidence, "build_steps": build_steps}
+        except Exception as e:
+            self.logger.error("Failed to analyze repository: %s", e)
+            return {"project_type": "unknown", "confidence": 0.0, "build_steps": [], "error": str(e)}
+        finally:
+            self.cleanup(repo_path)
+
+    def analyze_repositories(self, specs: List[Tuple[str, str]], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        Analyzes several (repo_url, branch) pairs on one event loop and returns
+        the analyses in the same order. The LLM connection is warmed up while
+        the clones are fetched.
+        """
+        async def run():
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+            async def analyze(repo_url, branch):
+                async with semaphore:
+                    return await self.analyze_async(repo_url, branch)
+
+            warm_up = asyncio.create_task(asyncio.to_thread(self.warm_up))
+            results = await asyncio.gather(*(analyze(repo_url, branch) for repo_url, branch in specs))
+            await warm_up
+            return results
+
+        return asyncio.run(run())
+
     def _detect_project_type(self, file_list: list) -> Tuple[str, float, list]:
         """
         Uses rule-based approach to detect project type from file list
         Returns (project_type, confidence, build_steps)
         """
-        # Check for Node.js project
-        if any(f == 'package.json' for f in file_list):
-            # It's a Node.js project
-            if any(f.endswith('.tsx') or f.endswith('.jsx') for f in file_list):
-                # React project
-                return "node_service", 0.9, ["npm install", "npm test", "npm build"]
-            elif any(f.endswith('.vue') for f in file_list):
-                # Vue project
-                return "node_service", 0.9, ["npm install", "npm test", "npm build"]
-            elif any(f.endswith('.angular.json') or f == 'angular.json' for f in file_list):
-                # Angular project
-                return "node_service", 0.9, ["npm install", "ng test", "ng build"]
-            else:
-                # Generic Node.js
-                return "node_service", 0.8, ["npm install", "npm test", "npm build"]
-        
-        # Check for Python project
-        elif any(f == 'requirements.txt' or f == 'setup.py' or f == 'pyproject.toml' for f in file_list):
-            if any(f.endswith('wsgi.py') for f in file_list) or any('django' in f.lower() for f in file_list):
-                # Django project
-                return "python", 0.9, ["pip install -r requirements.txt", "python manage.py test", "python manage.py collectstatic"]
-            elif any('flask' in f.lower() for f in file_list):
-                # Flask project
-                return "python", 0.9, ["pip install -r requirements.txt", "pytest", "python build"]
-            else:
-                # Generic Python
-                return "python", 0.8, ["pip install -r requirements.txt", "pytest"]
-        
-        # Check for Java project
-        elif any(f == 'pom.xml' for f in file_list):
-            # Maven project
-            return "java", 0.9, ["mvn clean", "mvn test", "mvn package"]
-        elif any(f == 'build.gradle' or f == 'build.gradle.kts' for f in file_list):
-            # Gradle project
-            return "java", 0.9, ["./gradlew clean", "./gradlew test", "./gradlew build"]
-        
-        # Check for .NET project
-        elif any(f.endswith('.csproj') for f in file_list):
-            if any(f.endswith('.razor') for f in file_list) or any(f.endswith('.cshtml') for f in file_list):
-                # ASP.NET project
-                return "aspnet_service", 0.9, ["dotnet restore", "dotnet test", "dotnet build", "dotnet publish"]
-            else:
-                # Generic .NET project
-                return "csharp_library", 0.8, ["dotnet restore", "dotnet test", "dotnet build"]
-        
-        # Static website
-        elif any(f == 'index.html' for f in file_list):
-            return "website", 0.7, ["npm install", "npm build"]
-        
-        # Unknown project type
-        return "unknown", 0.1, []
+        project_type, confidence, build_steps = _detect_from_flags(_marker_flags(file_list))
+        # Copy so callers never mutate the cached result
+        return project_type, confidence, list(build_steps)
             
     def _analyze_with_llm(self, file_list: list) -> Tuple[str, float, list]:
         """
         Uses LLM to analyze the repository and determine project type
         Returns (project_type, confidence, build_steps)
         """
+        # Only the files that carry signal go into the prompt (and the cache key)
+        file_list = _prompt_file_list(file_list)
+        cache_key = make_key(self._llm_model_id(), LLM_PROMPT_VERSION, *sorted(file_list))
+        cached = self._llm_cache.get(cache_key)
+        if cached is not None:
+            self.llm_cache_hits += 1
+            self.logger.debug("Using cached LLM analysis")
+            project_type, confidence, build_steps = cached
+            return project_type, confidence, list(build_steps)
+
         try:
             # Common prompt for all LLM providers
             prompt = f"""You are a DevOps engineer analyzing a code repository.
@@ -221,7 +925,7 @@ Respond with a JSON object containing:
 - build_steps: list of required build steps
 
 File list:
-{json.dumps(file_list, indent=2)}
+{_json_dumps(file_list, indent=True)}
 
 Response:"""
 
@@ -244,56 +948,86 @@ Response:"""
                 
                 if json_start >= 0 and json_end > json_start:
                     json_text = result[json_start:json_end]
-                    analysis = json.loads(json_text)
+                    analysis = _json_loads(json_text)
                 else:
-                    analysis = json.loads(result)
+                    analysis = _json_loads(result)
             except json.JSONDecodeError:
                 raise ValueError(f"Failed to parse LLM response as JSON: {result}")
 
-            self.logger.info(f"LLM analysis result: {json.dumps(analysis, indent=2)}")
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("LLM analysis result: %s", _json_dumps(analysis, indent=True))
 
             if not all(k in analysis for k in ["project_type", "confidence", "build_steps"]):
                 raise ValueError(f"Invalid response format from LLM: {analysis}")
 
+            self._llm_cache.set(cache_key, [analysis["project_type"], analysis["confidence"], analysis["build_steps"]])
             return analysis["project_type"], analysis["confidence"], analysis["build_steps"]
 
         except Exception as e:
-            self.logger.error(f"Failed to analyze with LLM: {str(e)}")
+            self.logger.error("Failed to analyze with LLM: %s", e)
             return "unknown", 0.0, []
             
+    def _llm_model_id(self) -> str:
+        """
+        Identifies the model answering prompts, without any API key
+        """
+        if self.provider == "openai":
+            return f"openai:{OPENAI_MODEL}"
+        return f"{self.provider}:{self.llm_url.split('?key=', 1)[0]}"
+
+    def _get_openai_client(self):
+        """
+        Returns the OpenAI client, creating it on first use so its HTTP
+        connection pool is shared by every call
+        """
+        with self._openai_client_lock:
+            if self._openai_client is None:
+                # Dynamically import OpenAI to avoid module-level dependencies
+                import importlib
+                try:
+                    openai_module = importlib.import_module('openai')
+                    self.logger.info("Successfully imported OpenAI library")
+                except ImportError:
+                    self.logger.error("OpenAI library not installed. Cannot use OpenAI for repository analysis.")
+                    return None
+
+                self._openai_client = openai_module.OpenAI(api_key=self.api_key, max_retries=3, timeout=30.0)
+            return self._openai_client
+
     def _analyze_with_openai(self, prompt: str) -> Optional[str]:
         """
         Uses OpenAI to analyze the repository
         """
         try:
-            # Dynamically import OpenAI to avoid module-level dependencies
-            import importlib
-            try:
-                # Try to import or reload the OpenAI module
-                openai_module = importlib.import_module('openai')
-                self.logger.info("Successfully imported OpenAI library")
-            except ImportError:
-                self.logger.error("OpenAI library not installed. Cannot use OpenAI for repository analysis.")
+            client = self._get_openai_client()
+            if client is None:
                 return None
             
-            # Create the OpenAI client with API key
-            client = openai_module.OpenAI(api_key=self.api_key)
-            
             self.logger.debug("Sending analysis request to OpenAI")
-            response = client.chat.completions.create(
-                model="gpt-4o",  # The newest OpenAI model, released May 13, 2024
+            stream = client.chat.completions.create(
+                model=OPENAI_MODEL,
                 messages=[
                     {"role": "system", "content": "You are a DevOps engineer analyzing code repositories."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.2,
                 max_tokens=1000,
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                stream=True
             )
-            return response.choices[0].message.content
+
+            # Stop reading as soon as the JSON answer is complete
+            scanner = _JSONObjectScanner()
+            try:
+                for chunk in stream:
+                    if chunk.choices and scanner.feed(chunk.choices[0].delta.content or ""):
+                        break
+            finally:
+                stream.close()
+            return scanner.result()
             
         except Exception as e:
-            self.logger.error(f"Error calling OpenAI: {str(e)}")
+            self.logger.error("Error calling OpenAI: %s", e)
             return None
             
     def _analyze_with_gemini(self, prompt: str) -> Optional[str]:
@@ -334,7 +1068,7 @@ Response:"""
                 request_url = f"{url}?key={api_key}"
                 
             # Make request
-            response = requests.post(
+            response = self._session.post(
                 request_url,
                 headers=headers,
                 json=request_body,
@@ -343,7 +1077,7 @@ Response:"""
             response.raise_for_status()
             
             # Process response
-            result = response.json()
+            result = _json_loads(response.content)
             
             # Extract content from Gemini response format
             if "candidates" in result and len(result["candidates"]) > 0:
@@ -353,7 +1087,7 @@ Response:"""
             return None
             
         except Exception as e:
-            self.logger.error(f"Error calling Gemini: {str(e)}")
+            self.logger.error("Error calling Gemini: %s", e)
             return None
             
     def _analyze_with_other_llm(self, prompt: str) -> Optional[str]:
@@ -361,61 +1095,154 @@ Response:"""
         Uses other LLM server to analyze the repository
         """
         try:
-            self.logger.debug(f"Sending analysis request to custom LLM at {self.llm_url}")
+            self.logger.debug("Sending analysis request to custom LLM at %s", self.llm_url)
             
-            # Generic format for Llama-like API
-            response = requests.post(
+            # Generic format for Llama-like API, streamed as server-sent events
+            with self._session.post(
                 f"{self.llm_url}/completion",
                 json={
                     "prompt": prompt,
                     "temperature": 0.2,
-                    "max_tokens": 500
+                    "max_tokens": 500,
+                    "stream": True
                 },
-                timeout=30
-            )
-            response.raise_for_status()
+                timeout=30,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+
+                # Servers that ignore "stream" answer with a single JSON body
+                if not response.headers.get("Content-Type", "").startswith("text/event-stream"):
+                    return _json_loads(response.content).get("content")
 
-            # Parse and validate response
-            result = response.json().get("content")
-            return result
+                # Closing the response early stops the server generating the tail
+                scanner = _JSONObjectScanner()
+                for line in response.iter_lines():
+                    if not line.startswith(b"data:"):
+                        continue
+                    event = _json_loads(line[len(b"data:"):])
+                    if scanner.feed(event.get("content", "")) or event.get("stop"):
+                        break
+                return scanner.result()
             
         except Exception as e:
-            self.logger.error(f"Error calling custom LLM: {str(e)}")
+            self.logger.error("Error calling custom LLM: %s", e)
             return None
 
+    def load_templates(self) -> None:
+        """
+        Reads every Jenkinsfile template into memory so requests don't hit the disk
+        """
+        templates = {}
+        for name in os.listdir(TEMPLATE_DIR):
+            if name.endswith(".groovy"):
+                with open(os.path.join(TEMPLATE_DIR, name), "r") as f:
+                    templates[name[:-len(".groovy")]] = f.read()
+
+        self._TEMPLATE_CACHE.update(templates)
+        self._TEMPLATE_BYTES_CACHE.update((name, content.encode("utf-8")) for name, content in templates.items())
+        self.logger.info("Loaded %s Jenkinsfile templates", len(templates))
+
+    def warm_up(self) -> None:
+        """
+        Pays one-time startup costs (LLM client import, connection setup)
+        so the first /execute does not have to
+        """
+        try:
+            if self.provider == "openai":
+                self._get_openai_client()
+            else:
+                # Open a pooled connection to the LLM host; the status is irrelevant
+                self._session.head(self.llm_url.split("?key=", 1)[0], timeout=2)
+            self.logger.info("Warmed up %s LLM client", self.provider)
+        except Exception as e:
+            self.logger.debug("LLM warm-up failed: %s", e)
+
+    def render_jenkins_file(self, project_type: str) -> str:
+        """
+        Returns the Jenkinsfile content for the project type
+        """
+        template_content = self._TEMPLATE_CACHE.get(project_type)
+        if template_content is not None:
+            return template_content
+
+        # Not preloaded; read it from disk and keep it for next time
+        template_path = os.path.join(TEMPLATE_DIR, f"{project_type}.groovy")
+        if not os.path.exists(template_path):
+            raise ValueError(f"Template not found for project type: {project_type}")
+
+        with open(template_path, "r") as f:
+            template_content = f.read()
+
+        self._TEMPLATE_CACHE[project_type] = template_content
+        return template_content
+
     def generate_jenkins_file(self, repo_path: str, project_type: str) -> None:
         """
         Generates a Jenkinsfile in the repository based on the project type
         """
         try:
-            # Read template file
-            template_path = os.path.join(os.path.dirname(__file__), "templates", f"{project_type}.groovy")
-            if not os.path.exists(template_path):
-                raise ValueError(f"Template not found for project type: {project_type}")
-
-            with open(template_path, "r") as f:
-                template_content = f.read()
+            data = self._TEMPLATE_BYTES_CACHE.get(project_type)
+            if data is None:
+                data = self.render_jenkins_file(project_type).encode("utf-8")
+                self._TEMPLATE_BYTES_CACHE[project_type] = data
 
             # Write Jenkinsfile to repository
             jenkins_path = os.path.join(repo_path, "Jenkinsfile")
-            self.logger.info(f"Generating Jenkinsfile at {jenkins_path}")
+            self.logger.info("Generating Jenkinsfile at %s", jenkins_path)
 
-            with open(jenkins_path, "w") as f:
-                f.write(template_content)
+            # Raw fd write of the pre-encoded buffer, no text-mode encoding per call.
+            # Written next to the target and renamed so readers never see a partial file
+            tmp_path = f"{jenkins_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, jenkins_path)
 
-            self.logger.debug(f"Generated Jenkinsfile content:\n{template_content}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Generated Jenkinsfile content:\n%s", data.decode('utf-8'))
 
         except Exception as e:
-            self.logger.error(f"Failed to generate Jenkinsfile: {str(e)}")
+            self.logger.error("Failed to generate Jenkinsfile: %s", e)
             raise
 
     def cleanup(self, repo_path: str) -> None:
         """
-        Cleans up the cloned repository
+        Cleans up the cloned repository. On POSIX the directory is renamed
+        out of the way and deleted by a background rm -rf, so this returns
+        immediately; see wait_for_cleanups().
         """
         try:
             if os.path.exists(repo_path):
-                self.logger.info(f"Cleaning up repository at {repo_path}")
-                shutil.rmtree(repo_path)
+                self.logger.info("Cleaning up repository at %s", repo_path)
+                if sys.platform == "win32":
+                    shutil.rmtree(repo_path, ignore_errors=True)
+                    return
+
+                trash_path = f"{repo_path}.trash-{uuid.uuid4().hex}"
+                os.rename(repo_path, trash_path)
+                try:
+                    process = subprocess.Popen(["rm", "-rf", "--", trash_path])
+                except OSError:
+                    shutil.rmtree(trash_path, ignore_errors=True)
+                    return
+
+                with self._cleanup_lock:
+                    # Reap finished deletions so they do not linger as zombies
+                    self._pending_cleanups = [p for p in self._pending_cleanups if p.poll() is None]
+                    self._pending_cleanups.append(process)
         except Exception as e:
-            self.logger.error(f"Failed to cleanup repository: {str(e)}")
\ No newline at end of file
+            self.logger.error("Failed to cleanup repository: %s", e)
+
+    def wait_for_cleanups(self) -> None:
+        """
+        Blocks until every background deletion started by cleanup() has finished
+        """
+        with self._cleanup_lock:
+            pending, self._pending_cleanups = self._pending_cleanups, []
+        for process in pending:
+            process.wait()
\ No newline at end of file
@@ -1,59 +1,191 @@
 from flask import request, jsonify
 import os
+import shutil
 import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from agents.utils.logger import setup_agent_logger
+from agents.utils.jobs import JobQueue, register_job_status_route, wants_async
+from agents.utils.json_provider import parse_json_body
+from agents.utils.singleflight import SingleFlight
+from agents.ci_agent.utils import validate_ci_request
 
 logger = setup_agent_logger('ci-agent')
 
-def validate_ci_request(data):
+# Jenkins templates that /health expects to find
+_TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+_REQUIRED_TEMPLATE_PATHS = tuple(
+    os.path.join(_TEMPLATE_DIR, template)
+    for template in (
+        "csharp_library.groovy",
+        "aspnet_service.groovy",
+        "node_service.groovy",
+        "website.groovy"
+    )
+)
+
+# Seconds for which /health reuses the result of its template and git checks
+_HEALTH_CHECK_TTL = 60
+_health_cache = {"checked_at": None, "templates_exist": False, "git_available": False}
+_health_lock = threading.Lock()
+
+# In-flight analyses keyed by (repository, branch)
+_inflight = SingleFlight(wait_timeout=300)
+
+# Seconds a git ls-remote may take before the branch counts as unresolved
+_LS_REMOTE_TIMEOUT = 10
+# Runs ls-remote next to the GitHub listing instead of before it
+_head_resolver = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ci-agent-ls-remote')
+
+def _check_dependencies():
     """
-    Validate incoming CI request data
+    Returns (templates_exist, git_available), re-checking at most once per _HEALTH_CHECK_TTL
     """
-    if not isinstance(data, dict):
-        return False, "Invalid request format"
+    with _health_lock:
+        now = time.monotonic()
+        checked_at = _health_cache["checked_at"]
+        if checked_at is not None and now - checked_at < _HEALTH_CHECK_TTL:
+            return _health_cache["templates_exist"], _health_cache["git_available"]
 
-    if 'parameters' not in data:
-        return False, "Missing parameters field"
+        # Check if template directory exists and contains required templates
+        templates_exist = all(map(os.path.exists, _REQUIRED_TEMPLATE_PATHS))
 
-    params = data['parameters']
-    required_fields = ['repository', 'branch', 'build_steps']
+        # Check git command availability (PATH lookup, no fork/exec)
+        git_available = shutil.which("git") is not None
 
-    for field in required_fields:
-        if field not in params:
-            return False, f"Missing required field: {field}"
+        _health_cache.update(checked_at=now, templates_exist=templates_exist, git_available=git_available)
+        return templates_exist, git_available
 
-    if not isinstance(params['build_steps'], list):
-        return False, "build_steps must be a list"
+def analyze_branch(repo_analyzer, repository, branch):
+    """
+    Analyzes the repository branch and renders its Jenkinsfile.
+    Returns (analysis dict, Jenkinsfile content); cached and fresh analyses go
+    through the same steps.
+    """
+    # ls-remote is only worth its round trip when its answer gets used: to look up a
+    # branch analyzed before, or to key the cache of a listing made without a clone
+    seen_before = repo_analyzer.has_cached_branch(repository, branch)
+    head_future = None
+    if seen_before or repo_analyzer.supports_remote_listing(repository):
+        head_future = _head_resolver.submit(repo_analyzer.resolve_head, repository, branch, _LS_REMOTE_TIMEOUT)
 
-    return True, None
+    analysis = None
+    if seen_before:
+        # Reuse a previous analysis if the branch has not moved since
+        head_sha = head_future.result()
+        analysis = repo_analyzer.get_cached_analysis(repository, head_sha)
+        if analysis is not None:
+            logger.info("Using cached analysis for %s@%s: %s", repository, head_sha, analysis)
+
+    if analysis is None:
+        analysis = _analyze_uncached(repo_analyzer, repository, branch, head_future)
+
+    # The Jenkinsfile is rendered from the template the same way for every path
+    # and returned to the caller; clones are throwaway, so nothing is written
+    jenkinsfile = repo_analyzer.render_jenkins_file(analysis['project_type'])
+    logger.info("Generated Jenkinsfile")
+    return analysis, jenkinsfile
+
+def _analyze_uncached(repo_analyzer, repository, branch, head_future):
+    """
+    Lists the branch (through the GitHub API when possible, otherwise from a
+    clone), detects its project type and caches the analysis
+    """
+    # GitHub can list the branch without a clone; ls-remote ran alongside it
+    file_list = repo_analyzer.list_remote_files(repository, branch) if head_future is not None else None
+    if file_list is not None:
+        analysis = repo_analyzer.analyze_project_type(file_list=file_list)
+        logger.info("Project analysis: %s", analysis)
+        repo_analyzer.cache_analysis(repository, head_future.result(), analysis, branch=branch)
+        return analysis
+
+    repo_path = None
+    try:
+        # Clone repository
+        repo_path = repo_analyzer.clone_repository(repository, branch)
+        logger.info("Repository cloned to %s", repo_path)
+
+        # Analyze project type
+        analysis = repo_analyzer.analyze_project_type(repo_path)
+        logger.info("Project analysis: %s", analysis)
+
+        # The clone knows its own HEAD, so no ls-remote result is waited for
+        repo_analyzer.cache_analysis(repository, repo_analyzer.get_head_sha(repo_path), analysis, branch=branch)
+        return analysis
+    finally:
+        # cleanup() only renames the clone; the deletion runs in the background
+        if repo_path:
+            repo_analyzer.cleanup(repo_path)
+
+def run_ci_pipeline(data, repo_analyzer):
+    """
+    Runs the CI pipeline setup for a validated request.
+    Returns a (response, status_code) tuple.
+    """
+    try:
+        repository = data['parameters']['repository']
+        branch = data['parameters']['branch']
+        build_steps = data['parameters']['build_steps']
+
+        logger.info("Processing CI pipeline for %s on branch %s", repository, branch)
+        logger.debug("Build steps: %s", build_steps)
+
+        # Concurrent requests for the same branch share one clone and analysis
+        analysis, jenkinsfile = _inflight.do((repository, branch), analyze_branch, repo_analyzer, repository, branch)
+
+        response = {
+            "status": "success",
+            "message": "CI pipeline created successfully",
+            "details": {
+                "repository": repository,
+                "branch": branch,
+                "project_type": analysis['project_type'],
+                "confidence": analysis['confidence'],
+                "build_steps": build_steps,
+                "pipeline_status": "Pipeline configured and ready",
+                "jenkinsfile": jenkinsfile
+            }
+        }
+
+        logger.info("Successfully created CI pipeline for %s", repository)
+        return response, 200
+
+    except subprocess.CalledProcessError as e:
+        error_msg = f"Git operation failed: {str(e)}"
+        logger.error(error_msg)
+        return {
+            "status": "error",
+            "message": error_msg,
+            "details": {
+                "command": e.cmd,
+                "exit_code": e.returncode,
+                "output": e.output.decode() if e.output else None
+            }
+        }, 500
+    except Exception as e:
+        logger.error("Error processing CI request: %s", e)
+        return {
+            "status": "error",
+            "message": f"Failed to process CI request: {str(e)}"
+        }, 500
 
 def register_routes(blueprint, repo_analyzer):
+    # Background workers for asynchronous /execute requests
+    job_queue = JobQueue(
+        max_workers=int(os.environ.get('CI_AGENT_JOB_WORKERS', '4')),
+        thread_name_prefix='ci-agent-job'
+    )
+
     @blueprint.route('/health')
     def health():
         """
         Health check endpoint that also verifies access to templates and dependencies
         """
         try:
-            # Check if template directory exists and contains required templates
-            template_dir = os.path.join(os.path.dirname(__file__), "templates")
-            required_templates = [
-                "csharp_library.groovy",
-                "aspnet_service.groovy",
-                "node_service.groovy",
-                "website.groovy"
-            ]
-            
-            templates_exist = all(
-                os.path.exists(os.path.join(template_dir, template))
-                for template in required_templates
-            )
-
-            # Check git command availability
-            try:
-                subprocess.run(["git", "--version"], check=True, capture_output=True)
-                git_available = True
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                git_available = False
+            templates_exist, git_available = _check_dependencies()
+
+            if not git_available:
                 logger.error("Git command not available")
 
             if not templates_exist:
@@ -78,7 +210,7 @@ def register_routes(blueprint, repo_analyzer):
                 "git_available": True
             })
         except Exception as e:
-            logger.error(f"Health check failed: {str(e)}")
+            logger.error("Health check failed: %s", e)
             return jsonify({
                 "status": "unhealthy",
                 "service": "ci-agent",
@@ -87,80 +219,48 @@ def register_routes(blueprint, repo_analyzer):
 
     @blueprint.route('/execute', methods=['POST'])
     def execute():
-        repo_path = None
         try:
-            data = request.get_json()
-            if not data:
-                return jsonify({
-                    "status": "error",
-                    "message": "No data provided"
-                }), 400
-
-            # Validate request
-            is_valid, error_message = validate_ci_request(data)
-            if not is_valid:
-                logger.error(f"Invalid request: {error_message}")
-                return jsonify({
-                    "status": "error",
-                    "message": error_message
-                }), 400
-
-            repository = data['parameters']['repository']
-            branch = data['parameters']['branch']
-            build_steps = data['parameters']['build_steps']
-
-            logger.info(f"Processing CI pipeline for {repository} on branch {branch}")
-            logger.debug(f"Build steps: {build_steps}")
-
-            # Clone repository
-            repo_path = repo_analyzer.clone_repository(repository, branch)
-            logger.info(f"Repository cloned to {repo_path}")
-
-            # Analyze project type
-            analysis = repo_analyzer.analyze_project_type(repo_path)
-            logger.info(f"Project analysis: {analysis}")
-
-            # Generate Jenkinsfile
-            repo_analyzer.generate_jenkins_file(repo_path, analysis['project_type'])
-            logger.info("Generated Jenkinsfile")
-
-            response = {
-                "status": "success",
-                "message": "CI pipeline created successfully",
-                "details": {
-                    "repository": repository,
-                    "branch": branch,
-                    "project_type": analysis['project_type'],
-                    "confidence": analysis['confidence'],
-                    "build_steps": build_steps,
-                    "pipeline_status": "Pipeline configured and ready"
-                }
-            }
-
-            logger.info(f"Successfully created CI pipeline for {repository}")
-            return jsonify(response)
+            data = parse_json_body(request)
+        except ValueError as e:
+            logger.error("Invalid JSON body: %s", e)
+            return jsonify({
+                "status": "error",
+                "message": "Invalid JSON body"
+            }), 400
 
-        except subprocess.CalledProcessError as e:
-            error_msg = f"Git operation failed: {str(e)}"
-            logger.error(error_msg)
+        if not data:
             return jsonify({
                 "status": "error",
-                "message": error_msg,
-                "details": {
-                    "command": e.cmd,
-                    "exit_code": e.returncode,
-                    "output": e.output.decode() if e.output else None
-                }
-            }), 500
-        except Exception as e:
-            logger.error(f"Error processing CI request: {str(e)}")
+                "message": "No data provided"
+            }), 400
+
+        # Validate request
+        is_valid, error_message = validate_ci_request(data)
+        if not is_valid:
+            logger.error("Invalid request: %s", error_message)
             return jsonify({
                 "status": "error",
-                "message": f"Failed to process CI request: {str(e)}"
-            }), 500
-        finally:
-            # Cleanup
-            if repo_path:
-                repo_analyzer.cleanup(repo_path)
+                "message": error_message
+            }), 400
+
+        # Asynchronous mode: queue the pipeline and let the client poll for it
+        if wants_async(data):
+            job_id = job_queue.submit(run_ci_pipeline, data, repo_analyzer)
+            logger.info("Queued CI pipeline for %s as job %s", data['parameters']['repository'], job_id)
+            return jsonify({
+                "status": "accepted",
+                "message": "CI pipeline queued",
+                "job_id": job_id
+            }), 202
+
+        response, status_code = run_ci_pipeline(data, repo_analyzer)
+        return jsonify(response), status_code
+
+    register_job_status_route(
+        blueprint,
+        job_queue,
+        failed_message="Failed to process CI request",
+        pending_message="CI pipeline is still being processed"
+    )
 
-    return blueprint
\ No newline at end of file
+    return blueprint
@@ -1,21 +1,17 @@
-def validate_ci_request(data):
-    """
-    Validate incoming CI request data
-    """
-    if not isinstance(data, dict):
-        return False, "Invalid request format"
-
-    if 'parameters' not in data:
-        return False, "Missing parameters field"
+from agents.utils.validation import RequestValidator, RequiredFields
 
-    params = data['parameters']
-    required_fields = ['repository', 'branch', 'build_steps']
+# Fields every CI request must provide
+REQUIRED_FIELDS = RequiredFields('repository', 'branch', 'build_steps')
 
-    for field in required_fields:
-        if field not in params:
-            return False, f"Missing required field: {field}"
+# (field, type, error) for each field whose type is checked, in this order
+_FIELD_TYPES = (
+    ('build_steps', list, "build_steps must be a list"),
+)
 
-    if not isinstance(params['build_steps'], list):
-        return False, "build_steps must be a list"
+_validator = RequestValidator(REQUIRED_FIELDS, _FIELD_TYPES)
 
-    return True, None
\ No newline at end of file
+def validate_ci_request(data):
+    """
+    Validate incoming CI request data
+    """
+    return _validator(data)
\ No newline at end of file
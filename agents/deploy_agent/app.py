@@ -1,232 +1,222 @@
 import sys
 import os
-from flask import Blueprint, request, jsonify, Flask
+from flask import Blueprint, request, jsonify, Flask, Response
 from agents.utils.logger import setup_agent_logger
+from agents.utils.json_provider import ORJSONProvider, encode_body, parse_json_body
+from agents.utils.database import database_uri, engine_options
+from agents.utils.jobs import JobQueue, register_job_status_route, wants_async
+from agents.utils.server import run_app
+from agents.deploy_agent.utils import validate_deploy_request
 from prometheus_flask_exporter import PrometheusMetrics
 import subprocess
 import logging
 import json
-from agents.deploy_agent.routes import register_routes
-from prometheus_client import REGISTRY, Collector
+import shutil
+import threading
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from prometheus_client import CollectorRegistry
 from agents.deploy_agent.smol_deploy_agent import SmolDeployAgent
 
+# asgiref is optional; it is only needed to serve the agent from an ASGI server
+WsgiToAsgi = None
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:
+    pass
+
 # Create Blueprint first
 deploy_agent_bp = Blueprint('deploy_agent', __name__)
 logger = setup_agent_logger('deploy-agent')
 
+# The key is read once; the agent is built with it and never sees a later value
+_OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+_OPENAI_KEY_SET = _OPENAI_API_KEY is not None
+
 # Initialize the SmolDeployAgent
 # Using OpenAI for LLM capabilities with the OPENAI_API_KEY environment variable
-smol_deploy_agent = SmolDeployAgent(api_key=os.environ.get('OPENAI_API_KEY'))
+smol_deploy_agent = SmolDeployAgent(api_key=_OPENAI_API_KEY)
 
+# Deployments block on helm/kubectl for minutes, so asynchronous requests run here
+job_queue = JobQueue(
+    max_workers=int(os.environ.get('DEPLOY_CONCURRENCY', '8')),
+    thread_name_prefix='deploy-agent-job'
+)
+
+# Database settings come from the environment, which does not change once the process starts
+_DATABASE_URI = database_uri()
+_ENGINE_OPTIONS = engine_options()
 
 def create_app():
     app = Flask(__name__)
+    app.json = ORJSONProvider(app)
     
     # Database configuration
-    database_url = os.environ.get('DATABASE_URL')
-    if database_url and database_url.startswith('postgres://'):
-        database_url = database_url.replace('postgres://', 'postgresql://', 1)
-
-    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_DATABASE_URI'] = _DATABASE_URI
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'pool_recycle': 300,
-        'pool_pre_ping': True,
-        'connect_args': {
-            'sslmode': 'require' if os.environ.get('POSTGRES_SSL', 'true').lower() == 'true' else 'prefer'
-        }
-    }
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(_ENGINE_OPTIONS)
     
-    # Initialize metrics with a unique registry name to avoid collisions
-    try:
-        # Try to unregister the app_info metric if it exists to avoid duplicates
-        for collector in list(REGISTRY._collector_to_names.keys()):
-            if 'app_info' in REGISTRY._collector_to_names.get(collector, []):
-                REGISTRY.unregister(collector)
-                logger.info("Unregistered existing app_info metric")
-                break
-                
-        metrics = PrometheusMetrics(app, registry_name='deploy_agent_registry')
-        metrics.info('deploy_agent_info', 'Application info', version='1.0.0', service='deploy_agent')
-    except Exception as e:
-        logger.warning(f"Prometheus metrics initialization error: {str(e)}")
-        # Create metrics without info to avoid errors
-        metrics = PrometheusMetrics(app, registry_name='deploy_agent_registry')
+    # Each app exports its own registry, so repeated create_app calls never
+    # collide on metric names in the process-wide default registry
+    # Request metrics are labelled by endpoint so /execute/<job_id> polls share
+    # one series, and health probes are left out of the per-request hooks
+    metrics = PrometheusMetrics(
+        app,
+        registry=CollectorRegistry(),
+        group_by='endpoint',
+        excluded_paths=['^/health$']
+    )
+    metrics.info('deploy_agent_info', 'Application info', version='1.0.0', service='deploy_agent')
     
     # Register the deploy_agent_bp blueprint
     app.register_blueprint(deploy_agent_bp)
     
     return app
 
-# Create the application instance
-app = create_app()
-def validate_deploy_request(data):
+# Seconds for which /health reuses the result of its git/helm/kubectl checks
+_HEALTH_TTL = 30
+_HEALTH_CACHE = {"ts": None, "payload": None, "status_code": None}
+_health_lock = threading.Lock()
+
+# (name, version command, message when unavailable) for each tool /health checks
+_TOOL_PROBES = (
+    ("git", ["git", "--version"], "Git command not available"),
+    ("helm", ["helm", "version"], "Helm command not available"),
+    ("kubectl", ["kubectl", "version", "--client"], "Kubectl command not available"),
+)
+
+# Longest a version command may run before its tool counts as unavailable
+_PROBE_TIMEOUT = 2.0
+
+def _probe_tool(command):
     """
-    Validate incoming deployment request data
+    Returns the version output of a single tool, or None if it cannot be run
     """
-    if not isinstance(data, dict):
-        return False, "Invalid request format"
+    try:
+        return subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                              timeout=_PROBE_TIMEOUT, check=True).stdout.strip()
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError):
+        return None
 
-    if 'parameters' not in data:
-        return False, "Missing parameters field"
+@lru_cache(maxsize=None)
+def _tool_versions():
+    """
+    Returns {name: version output} for the probed tools, running each version
+    command once per process since installed binaries do not change under it
+    """
+    # The probes spend their time waiting on process startup, so run them side by side
+    with ThreadPoolExecutor(max_workers=len(_TOOL_PROBES)) as executor:
+        futures = {name: executor.submit(_probe_tool, command) for name, command, _ in _TOOL_PROBES}
+        return {name: future.result() for name, future in futures.items()}
 
-    params = data['parameters']
-    required_fields = ['repository', 'namespace']
+def _probe_dependencies():
+    """
+    Checks the required tools and API key and builds the /health payload and status code
+    """
+    # PATH lookups only; no fork/exec on the liveness path
+    available = {name: shutil.which(name) is not None for name, _, _ in _TOOL_PROBES}
 
-    for field in required_fields:
-        if field not in params:
-            return False, f"Missing required field: {field}"
+    # Check OpenAI API key
+    openai_key_available = _OPENAI_KEY_SET
 
-    # Optional validation for specific fields
-    if 'service_ports' in params and not isinstance(params['service_ports'], list):
-        return False, "service_ports must be a list"
+    error_messages = []
+    for name, _, message in _TOOL_PROBES:
+        if not available[name]:
+            logger.error(message)
+            error_messages.append(message)
+    if not openai_key_available:
+        error_messages.append("OpenAI API key not set")
 
-    if 'environment_variables' in params and not isinstance(params['environment_variables'], dict):
-        return False, "environment_variables must be a dictionary"
-        
-    if 'cluster_details' in params and not isinstance(params['cluster_details'], dict):
-        return False, "cluster_details must be a dictionary"
-        
-    if 'helm_values' in params and not (isinstance(params['helm_values'], dict) or 
-                                         isinstance(params['helm_values'], str)):
-        return False, "helm_values must be a dictionary or a string path to a values file"
+    if error_messages:
+        status_code = 500
+        status = "unhealthy"
+        error_message = "; ".join(error_messages)
+    else:
+        status_code = 200
+        status = "healthy"
+        error_message = None
 
-    return True, None
+    return {
+        "status": status,
+        "service": "deploy-agent",
+        "git_available": available["git"],
+        "helm_available": available["helm"],
+        "kubectl_available": available["kubectl"],
+        "openai_key_available": openai_key_available,
+        "error": error_message
+    }, status_code
+
+def _check_dependencies():
+    """
+    Returns the /health payload and status code, re-checking at most once per _HEALTH_TTL
+    """
+    with _health_lock:
+        now = time.monotonic()
+        checked_at = _HEALTH_CACHE["ts"]
+        if checked_at is not None and now - checked_at < _HEALTH_TTL:
+            return _HEALTH_CACHE["payload"], _HEALTH_CACHE["status_code"]
+
+        payload, status_code = _probe_dependencies()
+        _HEALTH_CACHE.update(ts=now, payload=payload, status_code=status_code)
+        return payload, status_code
 
 @deploy_agent_bp.route('/health')
 def health():
     """
-    Health check endpoint that also verifies access to required tools (helm, kubectl, git)
+    Health check endpoint that also verifies access to required tools (helm, kubectl, git).
+    Pass ?detailed=1 to include the tool version strings
     """
     try:
-        # Check git command availability
-        try:
-            git_output = subprocess.check_output(["git", "--version"]).decode().strip()
-            git_available = True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            git_available = False
-            git_output = "Git command not available"
-            logger.error(git_output)
-
-        # Check helm command availability
-        try:
-            helm_output = subprocess.check_output(["helm", "version"]).decode().strip()
-            helm_available = True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            helm_available = False
-            helm_output = "Helm command not available"
-            logger.error(helm_output)
-            
-        # Check kubectl command availability
-        try:
-            kubectl_output = subprocess.check_output(["kubectl", "version", "--client"]).decode().strip()
-            kubectl_available = True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            kubectl_available = False
-            kubectl_output = "Kubectl command not available"
-            logger.error(kubectl_output)
-
-        # Check OpenAI API key
-        openai_key_available = os.environ.get('OPENAI_API_KEY') is not None
-
-        # Check if all required tools are available
-        all_available = git_available and helm_available and kubectl_available and openai_key_available
-        
-        if not all_available:
-            status_code = 500
-            status = "unhealthy"
-            
-            # Build error message
-            error_messages = []
-            if not git_available:
-                error_messages.append("Git command not available")
-            if not helm_available:
-                error_messages.append("Helm command not available")
-            if not kubectl_available:
-                error_messages.append("Kubectl command not available")
-            if not openai_key_available:
-                error_messages.append("OpenAI API key not set")
-                
-            error_message = "; ".join(error_messages)
-        else:
-            status_code = 200
-            status = "healthy"
-            error_message = None
-
-        return jsonify({
-            "status": status,
-            "service": "deploy-agent",
-            "git_available": git_available,
-            "git_version": git_output if git_available else None,
-            "helm_available": helm_available,
-            "helm_version": helm_output if helm_available else None,
-            "kubectl_available": kubectl_available,
-            "kubectl_version": kubectl_output if kubectl_available else None,
-            "openai_key_available": openai_key_available,
-            "error": error_message
-        }), status_code
+        payload, status_code = _check_dependencies()
+        if request.args.get('detailed'):
+            versions = _tool_versions()
+            payload = dict(payload)
+            for name, _, _ in _TOOL_PROBES:
+                payload[f"{name}_version"] = versions[name] if payload[f"{name}_available"] else None
+        return jsonify(payload), status_code
     except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
+        logger.error("Health check failed: %s", e)
         return jsonify({
             "status": "unhealthy",
             "service": "deploy-agent",
             "error": str(e)
         }), 500
 
-@deploy_agent_bp.route('/execute', methods=['POST'])
-def execute():
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({
-                "status": "error",
-                "message": "No data provided"
-            }), 400
+# /execute's rejections of empty and unparsable bodies never vary, so they are serialized once at import
+_NO_DATA_BODY = encode_body({"status": "error", "message": "No data provided"})
+_INVALID_JSON_BODY = encode_body({"status": "error", "message": "Invalid JSON body"})
 
-        # New validation logic adapted for SmolDeployAgent
-        if 'parameters' not in data:
-            return jsonify({
-                "status": "error",
-                "message": "Missing parameters field"
-            }), 400
+def _no_data_response():
+    return Response(_NO_DATA_BODY, status=400, mimetype='application/json')
 
-        params = data['parameters']
-        # Check for updated required fields for SmolDeployAgent
-        required_fields = ['repository', 'namespace']
-        missing_fields = [field for field in required_fields if field not in params]
-        
-        if missing_fields:
-            logger.error(f"Missing required fields: {', '.join(missing_fields)}")
-            return jsonify({
-                "status": "error",
-                "message": f"Missing required fields: {', '.join(missing_fields)}"
-            }), 400
+def _invalid_json_response():
+    return Response(_INVALID_JSON_BODY, status=400, mimetype='application/json')
+
+def run_deployment(data):
+    """
+    Runs a validated deployment request and returns (response, status_code)
+    """
+    params = data['parameters']
 
-        # If 'cluster_details' is not provided, add an empty dict
-        if 'cluster_details' not in params:
-            params['cluster_details'] = {}
-            logger.warning("No cluster_details provided, using default local configuration")
+    # If 'cluster_details' is not provided, add an empty dict
+    if 'cluster_details' not in params:
+        params['cluster_details'] = {}
+        logger.warning("No cluster_details provided, using default local configuration")
 
-        repository = params['repository']
-        namespace = params['namespace']
+    repository = params['repository']
+    namespace = params['namespace']
 
-        logger.info(f"Deploying {repository} to namespace {namespace}")
-        
+    logger.info("Deploying %s to namespace %s", repository, namespace)
+
+    try:
         # Use SmolDeployAgent to process the deployment
         result = smol_deploy_agent.process_deployment_task(data)
-        
-        # Log the result
-        if result["status"] == "success":
-            logger.info(f"Successfully deployed {repository} to {namespace}")
-        else:
-            logger.error(f"Failed to deploy {repository} to {namespace}: {result.get('message', 'Unknown error')}")
-        
-        return jsonify(result)
-
     except subprocess.CalledProcessError as e:
         error_msg = f"Command execution failed: {str(e)}"
         logger.error(error_msg)
-        return jsonify({
+        return {
             "status": "error",
             "message": error_msg,
             "details": {
@@ -234,13 +224,70 @@ def execute():
                 "exit_code": e.returncode,
                 "output": e.output.decode() if e.output else None
             }
-        }), 500
+        }, 500
+
+    # Log the result
+    if result["status"] == "success":
+        logger.info("Successfully deployed %s to %s", repository, namespace)
+    else:
+        logger.error("Failed to deploy %s to %s: %s", repository, namespace, result.get('message', 'Unknown error'))
+
+    return result, 200
+
+@deploy_agent_bp.route('/execute', methods=['POST'])
+def execute():
+    try:
+        # The body is read and parsed once (by orjson through the app's JSON provider) and not kept
+        try:
+            data = parse_json_body(request)
+        except ValueError as e:
+            logger.error("Invalid JSON body: %s", e)
+            return _invalid_json_response()
+        if not data:
+            return _no_data_response()
+
+        is_valid, error_message = validate_deploy_request(data)
+        if not is_valid:
+            logger.error("Invalid request: %s", error_message)
+            return jsonify({
+                "status": "error",
+                "message": error_message
+            }), 400
+
+        # Asynchronous mode: queue the deployment and let the client poll for it
+        if wants_async(data):
+            job_id = job_queue.submit(run_deployment, data)
+            logger.info("Queued deployment of %s as job %s", data['parameters']['repository'], job_id)
+            return jsonify({
+                "status": "accepted",
+                "message": "Deployment queued",
+                "job_id": job_id
+            }), 202
+
+        response, status_code = run_deployment(data)
+        return jsonify(response), status_code
+
     except Exception as e:
-        logger.error(f"Error processing deployment: {str(e)}")
+        logger.error("Error processing deployment: %s", e)
         return jsonify({
             "status": "error",
             "message": f"Failed to process deployment: {str(e)}"
         }), 500
 
+register_job_status_route(
+    deploy_agent_bp,
+    job_queue,
+    failed_message="Failed to process deployment",
+    pending_message="Deployment is still being processed"
+)
+
+# Create the application instance once every route is on the blueprint
+app = create_app()
+
+# ASGI entry point (uvicorn agents.deploy_agent.app:asgi_app). Deployments
+# block for minutes on helm/kubectl, so they run in the adapter's thread
+# pool while the event loop keeps accepting requests
+asgi_app = WsgiToAsgi(app) if WsgiToAsgi is not None else None
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=9003, debug=True)
\ No newline at end of file
+    run_app(app, port=9003)
\ No newline at end of file
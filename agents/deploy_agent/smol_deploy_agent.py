@@ -6,25 +6,144 @@ Kubernetes deployments through Helm charts. It interprets deployment
 requirements, constructs appropriate Helm commands, and executes them.
 """
 
+import asyncio
+import hashlib
 import os
 import json
 import logging
+import shlex
 import subprocess
 import tempfile
 import shutil
-from typing import Dict, Any, List, Tuple, Optional
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import IO, Dict, Any, List, Tuple, Optional
 
 import openai
 from openai import OpenAI
 
+from agents.deploy_agent.utils import TASK_REQUIRED_FIELDS
+from agents.utils.openai_client import shared_openai_client
+
 logger = logging.getLogger(__name__)
 
+# orjson is optional; without it JSON goes through the standard json module
+orjson = None
+
+try:
+    import orjson
+except ImportError:
+    logger.warning("orjson not installed, falling back to the standard json module")
+
+# kubernetes is optional; without it deployments are verified through helm and kubectl
+k8s_client = None
+k8s_config = None
+
+try:
+    from kubernetes import client as k8s_client, config as k8s_config
+except ImportError:
+    logger.warning("kubernetes client not installed, verifying deployments with helm and kubectl")
+
+# PyYAML is optional; without it values files are written as JSON, which Helm also reads
+yaml = None
+
+try:
+    import yaml
+except ImportError:
+    logger.warning("PyYAML not installed, writing Helm values files as JSON")
+
+
+def _json_loads(data):
+    """
+    Parses JSON from str or bytes, using orjson when available
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps_indented(data) -> str:
+    """
+    Serializes data as JSON indented by two spaces, using orjson when available
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(data, indent=2)
+
+
+# Commands that only prepare for the install and do not depend on each other;
+# they run concurrently before any other command
+_PREPARE_COMMANDS = frozenset(('create_namespace', 'add_repo', 'clone_repository'))
+
+# Instructions around the deployment details in the command generation prompt
+_PROMPT_HEAD = """
+Generate a sequence of Helm commands to deploy a Kubernetes application with the following details:
+
+"""
+
+_PROMPT_TAIL = """
+The commands should:
+1. Ensure the namespace exists
+2. Add/update required Helm repositories if needed
+3. Install or upgrade the Helm chart
+4. Verify the deployment status
+
+Each command is executed directly, without a shell, so do not use pipes, redirection or
+command chaining. Return the commands as a JSON object with descriptive keys and each
+command as an array of arguments. For example:
+{
+  "add_repo": ["helm", "repo", "add", "example", "https://charts.example.com/"],
+  "install_chart": ["helm", "upgrade", "--install", "example-release", "example/chart", "--namespace", "example", "--create-namespace"],
+  "verify_deployment": ["kubectl", "-n", "example", "get", "pods"]
+}
+
+Ensure that any connection parameters from cluster_details (like kubeconfig paths or contexts) are properly included in the commands.
+"""
+
+# Helm values with at most this many leaves are passed inline with --set-json;
+# larger ones are written to a values file
+_INLINE_VALUES_MAX_LEAVES = 32
+
+# Generated command plans are reused for identical deployments for up to an hour
+_LLM_CACHE_MAX_ENTRIES = 512
+_LLM_CACHE_TTL = 3600
+
+@dataclass(slots=True)
+class DeployParams:
+    """
+    Parameters of one deployment, read from the task once and passed to every step
+    """
+    repository: str
+    namespace: str
+    cluster_details: Dict[str, Any]
+    release_name: str
+    helm_values: Any = None
+    context: Optional[str] = None
+
+
+# Commands run without a shell, so a generated command using these is rejected
+_SHELL_OPERATORS = frozenset(('|', '||', '&&', ';', '&', '>', '>>', '<'))
+
 class SmolDeployAgent:
     """
     SmolAgent-based deployment agent that processes deployment tasks,
     generates appropriate Helm commands, and executes them.
     """
 
+    # Resolved binary paths, shared by every agent instance
+    _binary_paths: Dict[str, str] = {}
+
+    # LLM command plans by deployment key, as (stored at, commands); shared by every agent instance
+    _llm_cache: "OrderedDict[str, Tuple[float, Dict[str, List[str]]]]" = OrderedDict()
+    _llm_cache_lock = threading.Lock()
+
+    # Kubernetes API clients by (kubeconfig path, context), so verifications
+    # against the same cluster reuse one apiserver connection pool
+    _k8s_api_clients: Dict[Tuple[Optional[str], Optional[str]], Any] = {}
+    _k8s_api_clients_lock = threading.Lock()
+
     def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o"):
         """
         Initialize the deployment agent.
@@ -35,29 +154,38 @@ class SmolDeployAgent:
         """
         self.api_key = api_key or os.environ.get('OPENAI_API_KEY')
         self.model = model
-        self.client = OpenAI(api_key=self.api_key)
         self.helm_binary = self._find_helm_binary()
         self.kubectl_binary = self._find_kubectl_binary()
 
+    @property
+    def client(self) -> OpenAI:
+        """The shared OpenAI client, created the first time a plan is generated."""
+        return shared_openai_client(self.api_key)
+
     def _find_helm_binary(self) -> str:
         """Find the helm binary in the system."""
-        try:
-            helm_path = subprocess.check_output(['which', 'helm']).decode().strip()
-            logger.info(f"Found helm binary at {helm_path}")
-            return helm_path
-        except subprocess.CalledProcessError:
-            logger.warning("Helm binary not found, using 'helm' assuming it's in PATH")
-            return 'helm'
+        return self._find_binary('helm')
 
     def _find_kubectl_binary(self) -> str:
         """Find the kubectl binary in the system."""
-        try:
-            kubectl_path = subprocess.check_output(['which', 'kubectl']).decode().strip()
-            logger.info(f"Found kubectl binary at {kubectl_path}")
-            return kubectl_path
-        except subprocess.CalledProcessError:
-            logger.warning("kubectl binary not found, using 'kubectl' assuming it's in PATH")
-            return 'kubectl'
+        return self._find_binary('kubectl')
+
+    @classmethod
+    def _find_binary(cls, name: str) -> str:
+        """
+        Looks name up on PATH once per process and returns its path, or the bare
+        name if it was not found
+        """
+        path = cls._binary_paths.get(name)
+        if path is None:
+            path = shutil.which(name)
+            if path:
+                logger.info("Found %s binary at %s", name, path)
+            else:
+                logger.warning("%s binary not found, using '%s' assuming it's in PATH", name, name)
+                path = name
+            cls._binary_paths[name] = path
+        return path
 
     def process_deployment_task(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -71,6 +199,8 @@ class SmolDeployAgent:
                 - cluster_details: Connection details for the target cluster
                 - helm_values: Values to pass to Helm (can be a path or inline values)
                 - release_name: Optional name for the Helm release
+                - use_llm_planner: Optional flag to have the LLM plan the commands
+                  instead of using the default Helm commands
         
         Returns:
             Dictionary with the result of the deployment operation
@@ -81,9 +211,7 @@ class SmolDeployAgent:
                 return {"status": "error", "message": "Missing parameters field"}
 
             params = task_data['parameters']
-            required_fields = ['repository', 'namespace', 'cluster_details']
-            missing_fields = [field for field in required_fields if field not in params]
-            
+            missing_fields = TASK_REQUIRED_FIELDS.missing(params)
             if missing_fields:
                 return {
                     "status": "error", 
@@ -91,163 +219,240 @@ class SmolDeployAgent:
                 }
 
             repository = params['repository']
-            namespace = params['namespace']
             cluster_details = params['cluster_details']
-            helm_values = params.get('helm_values', {})
-            release_name = params.get('release_name', repository.split('/')[-1])
+            deployment = DeployParams(
+                repository=repository,
+                namespace=params['namespace'],
+                cluster_details=cluster_details,
+                release_name=params.get('release_name', repository.split('/')[-1]),
+                helm_values=params.get('helm_values', {}),
+                context=cluster_details.get('context')
+            )
 
-            # Check if we have cluster access
-            if not self._verify_cluster_access(cluster_details):
-                return {
-                    "status": "error",
-                    "message": "Failed to connect to the target cluster"
-                }
+            # Every command of this deployment gets the same KUBECONFIG through its
+            # own environment, so concurrent deployments never share os.environ
+            env, kubeconfig_file = self._prepare_kubeconfig(cluster_details)
+            values_file = None
+            try:
+                values_args, values_file = self._prepare_values(deployment.helm_values)
 
-            # Generate and execute Helm commands
-            commands = self._generate_helm_commands(repository, namespace, release_name, helm_values, cluster_details)
-            
-            # Execute commands
-            results = {}
-            for cmd_name, command in commands.items():
-                try:
-                    logger.info(f"Executing {cmd_name}: {command}")
-                    output = subprocess.check_output(command, shell=True).decode()
-                    results[cmd_name] = {
-                        "status": "success",
-                        "output": output
-                    }
-                except subprocess.CalledProcessError as e:
-                    results[cmd_name] = {
+                # Check if we have cluster access
+                if not self._verify_cluster_access(deployment, env):
+                    return {
                         "status": "error",
-                        "error": str(e),
-                        "output": e.output.decode() if e.output else ""
+                        "message": "Failed to connect to the target cluster"
                     }
-                    # Return immediately if a command fails
+
+                # The default commands cover a standard Helm deployment; the LLM
+                # round trip is only paid for when the caller asks for it
+                if params.get('use_llm_planner'):
+                    commands = self._generate_helm_commands(deployment, values_args)
+                else:
+                    commands = self._get_default_commands(deployment, values_args)
+            
+                # Execute commands
+                results, failed_command = asyncio.run(self._execute_commands(commands, env))
+                if failed_command is not None:
+                    # Stop at the first stage with a failing command
                     return {
                         "status": "error",
-                        "message": f"Command '{cmd_name}' failed",
+                        "message": f"Command '{failed_command}' failed",
                         "details": results
                     }
 
-            # Verify deployment
-            deployment_status = self._verify_deployment(namespace, release_name)
+                # Verify deployment
+                deployment_status = self._verify_deployment(
+                    deployment.namespace, deployment.release_name, env, deployment.context,
+                    shared_client=kubeconfig_file is None
+                )
             
-            return {
-                "status": "success" if deployment_status["status"] == "success" else "error",
-                "message": "Deployment completed successfully" if deployment_status["status"] == "success" else "Deployment completed with issues",
-                "details": {
-                    "repository": repository,
-                    "namespace": namespace,
-                    "release_name": release_name,
-                    "commands": results,
-                    "deployment_verification": deployment_status
+                return {
+                    "status": "success" if deployment_status["status"] == "success" else "error",
+                    "message": "Deployment completed successfully" if deployment_status["status"] == "success" else "Deployment completed with issues",
+                    "details": {
+                        "repository": deployment.repository,
+                        "namespace": deployment.namespace,
+                        "release_name": deployment.release_name,
+                        "commands": results,
+                        "deployment_verification": deployment_status
+                    }
                 }
-            }
-        
+            finally:
+                # Closing the temporary kubeconfig and values file, if they were created, deletes them
+                for temp_file in (kubeconfig_file, values_file):
+                    if temp_file is not None:
+                        temp_file.close()
+
         except Exception as e:
-            logger.error(f"Error processing deployment: {str(e)}")
+            logger.error("Error processing deployment: %s", e)
             return {
                 "status": "error",
                 "message": f"Failed to process deployment: {str(e)}"
             }
 
-    def _verify_cluster_access(self, cluster_details: Dict[str, Any]) -> bool:
+    @staticmethod
+    def _plan_command_stages(commands: Dict[str, List[str]]) -> List[List[Tuple[str, List[str]]]]:
+        """
+        Splits commands into stages that run one after another. The independent
+        preparation commands share the first stage; every other command keeps
+        its original order in a stage of its own.
+        """
+        prepare = [(name, command) for name, command in commands.items() if name in _PREPARE_COMMANDS]
+        stages = [prepare] if prepare else []
+        stages.extend([(name, command)] for name, command in commands.items() if name not in _PREPARE_COMMANDS)
+        return stages
+
+    async def _run_command(self, command: List[str], env: Optional[Dict[str, str]] = None) -> str:
+        """
+        Runs a single argv command and returns its output, raising CalledProcessError on failure.
+        """
+        proc = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE, env=env)
+        output, _ = await proc.communicate()
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, command, output=output)
+        return output.decode()
+
+    async def _execute_commands(self, commands: Dict[str, List[str]],
+                                env: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Executes the commands stage by stage, running the commands of a stage
+        concurrently. Only the preparation stage holds more than one command, so
+        at most len(_PREPARE_COMMANDS) commands run at once.
+
+        Returns:
+            The per-command results and the name of the first failed command, or None
+        """
+        results = {}
+        for stage in self._plan_command_stages(commands):
+            for cmd_name, command in stage:
+                logger.info("Executing %s: %s", cmd_name, command)
+
+            outcomes = await asyncio.gather(
+                *(self._run_command(command, env) for _, command in stage),
+                return_exceptions=True
+            )
+
+            failed_command = None
+            for (cmd_name, _), outcome in zip(stage, outcomes):
+                if isinstance(outcome, subprocess.CalledProcessError):
+                    results[cmd_name] = {
+                        "status": "error",
+                        "error": str(outcome),
+                        "output": outcome.output.decode() if outcome.output else ""
+                    }
+                    failed_command = failed_command or cmd_name
+                elif isinstance(outcome, BaseException):
+                    raise outcome
+                else:
+                    results[cmd_name] = {
+                        "status": "success",
+                        "output": outcome
+                    }
+
+            if failed_command is not None:
+                return results, failed_command
+
+        return results, None
+
+    def _prepare_kubeconfig(self, cluster_details: Dict[str, Any]) -> Tuple[Optional[Dict[str, str]], Optional[IO[str]]]:
+        """
+        Builds the environment for commands run against the target cluster.
+
+        Args:
+            cluster_details: Connection details for the target cluster
+
+        Returns:
+            The environment to pass to subprocesses (None to inherit the process
+            environment) and the temporary kubeconfig file, if any, which the
+            caller closes to delete it
+        """
+        kubeconfig = cluster_details.get('kubeconfig')
+        if not kubeconfig:
+            return None, None
+
+        temp_file = None
+        # Create temporary file for kubeconfig if it's provided as content
+        if isinstance(kubeconfig, dict) or isinstance(kubeconfig, str) and not os.path.isfile(kubeconfig):
+            temp_file = tempfile.NamedTemporaryFile('w', prefix='kubeconfig-', suffix='.yaml')
+            try:
+                if isinstance(kubeconfig, dict):
+                    json.dump(kubeconfig, temp_file)
+                else:
+                    temp_file.write(kubeconfig)
+                temp_file.flush()
+            except Exception:
+                temp_file.close()
+                raise
+            kubeconfig_path = temp_file.name
+        else:
+            kubeconfig_path = kubeconfig
+
+        env = os.environ.copy()
+        env['KUBECONFIG'] = kubeconfig_path
+        return env, temp_file
+
+    def _verify_cluster_access(self, deployment: DeployParams, env: Optional[Dict[str, str]] = None) -> bool:
         """
         Verify that we have access to the target Kubernetes cluster.
         
         Args:
-            cluster_details: Connection details for the target cluster
-                Could include kubeconfig path, context name, etc.
+            deployment: The deployment whose cluster context is checked
+            env: Environment for the kubectl call, as built by _prepare_kubeconfig
         
         Returns:
             True if access verification succeeds, False otherwise
         """
-        temp_dir = None
         try:
-            # If kubeconfig is provided, set it up
-            kubeconfig = cluster_details.get('kubeconfig')
-            context = cluster_details.get('context')
-            
-            kubectl_cmd = f"{self.kubectl_binary} get nodes"
+            context = deployment.context
             
-            if kubeconfig:
-                # Create temporary file for kubeconfig if it's provided as content
-                if isinstance(kubeconfig, dict) or isinstance(kubeconfig, str) and not os.path.isfile(kubeconfig):
-                    temp_dir = tempfile.mkdtemp()
-                    kubeconfig_path = os.path.join(temp_dir, 'kubeconfig')
-                    
-                    with open(kubeconfig_path, 'w') as f:
-                        if isinstance(kubeconfig, dict):
-                            json.dump(kubeconfig, f)
-                        else:
-                            f.write(kubeconfig)
-                    
-                    os.environ['KUBECONFIG'] = kubeconfig_path
-                else:
-                    os.environ['KUBECONFIG'] = kubeconfig
+            kubectl_cmd = [self.kubectl_binary, 'get', 'nodes']
             
             if context:
-                kubectl_cmd = f"{self.kubectl_binary} --context={context} get nodes"
+                kubectl_cmd = [self.kubectl_binary, f"--context={context}", 'get', 'nodes']
             
             # Run the command to check cluster access
-            logger.info(f"Verifying cluster access with: {kubectl_cmd}")
-            subprocess.check_output(kubectl_cmd, shell=True)
+            logger.info("Verifying cluster access with: %s", kubectl_cmd)
+            subprocess.check_output(kubectl_cmd, env=env)
             return True
             
         except subprocess.CalledProcessError as e:
-            logger.error(f"Failed to verify cluster access: {e.output.decode() if e.output else str(e)}")
+            logger.error("Failed to verify cluster access: %s", e.output.decode() if e.output else e)
             return False
         except Exception as e:
-            logger.error(f"Error verifying cluster access: {str(e)}")
+            logger.error("Error verifying cluster access: %s", e)
             return False
-        finally:
-            # Clean up temporary kubeconfig if created
-            if temp_dir:
-                shutil.rmtree(temp_dir)
 
-    def _generate_helm_commands(self, repository: str, namespace: str, release_name: str, 
-                               helm_values: Dict[str, Any], cluster_details: Dict[str, Any]) -> Dict[str, str]:
+    def _generate_helm_commands(self, deployment: DeployParams, values_args: List[str]) -> Dict[str, List[str]]:
         """
         Generate Helm commands for deployment based on provided parameters.
         
         This uses the LLM to generate appropriate commands based on the input parameters.
         
         Args:
-            repository: Git repository with Helm charts
-            namespace: Target Kubernetes namespace
-            release_name: Helm release name
-            helm_values: Values to pass to Helm
-            cluster_details: Connection details for the target cluster
+            deployment: The deployment to plan
+            values_args: Helm arguments for the deployment's values, as built by _prepare_values,
+                used by the default commands if generation fails
         
         Returns:
-            Dictionary of command name to command string
+            Dictionary of command name to argv list
         """
-        # Create prompt for LLM to generate Helm commands
-        prompt = f"""
-Generate a sequence of Helm commands to deploy a Kubernetes application with the following details:
-
-- Repository: {repository}
-- Namespace: {namespace}
-- Release Name: {release_name}
-- Helm Values: {json.dumps(helm_values, indent=2)}
-- Cluster Details: {json.dumps(cluster_details, indent=2)}
-
-The commands should:
-1. Ensure the namespace exists
-2. Add/update required Helm repositories if needed
-3. Install or upgrade the Helm chart
-4. Verify the deployment status
+        cache_key = self._commands_cache_key(deployment)
+        commands = self._get_cached_commands(cache_key)
+        if commands is not None:
+            logger.info("Reusing generated commands for %s in %s", deployment.release_name, deployment.namespace)
+            return commands
 
-Return the commands as a JSON object with descriptive keys and commands as values. For example:
-{{
-  "create_namespace": "kubectl create namespace example --dry-run=client -o yaml | kubectl apply -f -",
-  "add_repo": "helm repo add example https://charts.example.com/",
-  "install_chart": "helm upgrade --install example-release example/chart --namespace example",
-  "verify_deployment": "kubectl -n example get pods"
-}}
-
-Ensure that any connection parameters from cluster_details (like kubeconfig paths or contexts) are properly included in the commands.
-"""
+        # Create prompt for LLM to generate Helm commands; only the deployment
+        # details are formatted per call
+        prompt = (
+            f"{_PROMPT_HEAD}"
+            f"- Repository: {deployment.repository}\n"
+            f"- Namespace: {deployment.namespace}\n"
+            f"- Release Name: {deployment.release_name}\n"
+            f"- Helm Values: {_json_dumps_indented(deployment.helm_values)}\n"
+            f"- Cluster Details: {_json_dumps_indented(deployment.cluster_details)}\n"
+            f"{_PROMPT_TAIL}"
+        )
 
         try:
             # Generate commands using LLM
@@ -262,93 +467,116 @@ Ensure that any connection parameters from cluster_details (like kubeconfig path
             
             # Parse JSON response
             try:
-                commands = json.loads(commands_text)
-                logger.info(f"Generated commands: {commands}")
+                commands = self._parse_commands(json.loads(commands_text))
+                if commands is None:
+                    logger.error("LLM response is not a set of runnable commands: %s", commands_text)
+                    return self._get_default_commands(deployment, values_args)
+                logger.info("Generated commands: %s", commands)
+                self._cache_commands(cache_key, commands)
                 return commands
             except json.JSONDecodeError:
-                logger.error(f"Failed to parse LLM response as JSON: {commands_text}")
+                logger.error("Failed to parse LLM response as JSON: %s", commands_text)
                 # Fall back to basic commands if parsing fails
-                return self._get_default_commands(repository, namespace, release_name, helm_values, cluster_details)
+                return self._get_default_commands(deployment, values_args)
                 
         except Exception as e:
-            logger.error(f"Error generating Helm commands with LLM: {str(e)}")
+            logger.error("Error generating Helm commands with LLM: %s", e)
             # Fall back to basic commands
-            return self._get_default_commands(repository, namespace, release_name, helm_values, cluster_details)
+            return self._get_default_commands(deployment, values_args)
+
+    def _commands_cache_key(self, deployment: DeployParams) -> str:
+        """
+        Builds a stable key for the inputs that determine a generated command plan
+        """
+        inputs = json.dumps([self.model, deployment.repository, deployment.namespace, deployment.release_name,
+                             deployment.helm_values, deployment.cluster_details],
+                            sort_keys=True, default=str)
+        return hashlib.sha256(inputs.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def _get_cached_commands(cls, key: str) -> Optional[Dict[str, List[str]]]:
+        """
+        Returns the cached command plan for key, or None if it is missing or expired
+        """
+        with cls._llm_cache_lock:
+            entry = cls._llm_cache.get(key)
+            if entry is None:
+                return None
+            stored_at, commands = entry
+            if time.monotonic() - stored_at >= _LLM_CACHE_TTL:
+                del cls._llm_cache[key]
+                return None
+            cls._llm_cache.move_to_end(key)
+            return commands
+
+    @classmethod
+    def _cache_commands(cls, key: str, commands: Dict[str, List[str]]) -> None:
+        """
+        Stores a generated command plan, evicting the least recently used ones
+        """
+        with cls._llm_cache_lock:
+            cls._llm_cache[key] = (time.monotonic(), commands)
+            cls._llm_cache.move_to_end(key)
+            while len(cls._llm_cache) > _LLM_CACHE_MAX_ENTRIES:
+                cls._llm_cache.popitem(last=False)
 
-    def _get_default_commands(self, repository: str, namespace: str, release_name: str,
-                             helm_values: Dict[str, Any], cluster_details: Dict[str, Any]) -> Dict[str, str]:
+    @staticmethod
+    def _parse_commands(commands: Any) -> Optional[Dict[str, List[str]]]:
         """
-        Generate default Helm commands if LLM generation fails.
+        Converts generated commands to argv lists, splitting any command given as
+        a string. Returns None if a command is malformed or relies on a shell.
+        """
+        if not isinstance(commands, dict) or not commands:
+            return None
+
+        parsed = {}
+        for cmd_name, command in commands.items():
+            if isinstance(command, str):
+                command = shlex.split(command)
+            if not isinstance(command, list) or not command or not all(isinstance(arg, str) for arg in command):
+                return None
+            if not _SHELL_OPERATORS.isdisjoint(command):
+                return None
+            parsed[cmd_name] = command
+        return parsed
+
+    def _get_default_commands(self, deployment: DeployParams, values_args: List[str]) -> Dict[str, List[str]]:
+        """
+        Generate the default Helm commands, used unless the LLM planner is
+        requested and as its fallback.
         
         Args:
-            Same as _generate_helm_commands
+            deployment: The deployment to plan
+            values_args: Helm arguments for the values, as built by _prepare_values
         
         Returns:
-            Dictionary of command name to command string
+            Dictionary of command name to argv list
         """
-        # Build command strings
-        context_part = f"--context={cluster_details['context']}" if 'context' in cluster_details else ""
-        
-        # Create namespace command
-        create_ns_cmd = f"{self.kubectl_binary} {context_part} create namespace {namespace} --dry-run=client -o yaml | {self.kubectl_binary} apply -f -"
-        
-        # Handle helm values
-        values_file = ""
-        values_args = ""
-        temp_dir = None
-        
-        if helm_values:
-            if isinstance(helm_values, str) and os.path.isfile(helm_values):
-                # If helm_values is a path to an existing file
-                values_args = f"--values {helm_values}"
-            else:
-                # If helm_values is a dictionary or JSON string
-                # Create a temporary file to store values
-                if isinstance(helm_values, str):
-                    try:
-                        helm_values = json.loads(helm_values)
-                    except json.JSONDecodeError:
-                        # If not valid JSON, treat as inline values string
-                        values_args = f"--set {helm_values}"
-                        helm_values = {}
-                
-                if isinstance(helm_values, dict) and helm_values:
-                    # Convert dictionary to --set arguments
-                    set_args = []
-                    for k, v in helm_values.items():
-                        if isinstance(v, (dict, list)):
-                            # For complex values, we'll use a values file
-                            temp_dir = tempfile.mkdtemp()
-                            values_file = os.path.join(temp_dir, 'values.yaml')
-                            with open(values_file, 'w') as f:
-                                json.dump(helm_values, f)
-                            values_args = f"--values {values_file}"
-                            break
-                        else:
-                            # For simple values, use --set
-                            set_args.append(f"{k}={v}")
-                    
-                    if set_args and not values_file:
-                        values_args = f"--set {','.join(set_args)}"
+        # Build context arguments; helm spells kubectl's --context as --kube-context
+        kubectl_context = [f"--context={deployment.context}"] if deployment.context else []
+        helm_context = [f"--kube-context={deployment.context}"] if deployment.context else []
+        repository = deployment.repository
+        release_name = deployment.release_name
         
         # Build default commands
         chart_path = repository
         if '/' not in repository or 'github.com' in repository:
             # It's likely a Git repo or chart name without repo prefix
             chart_path = f"./{release_name}"
-            clone_cmd = f"git clone {repository} {release_name}"
+            clone_cmd = ['git', 'clone', repository, release_name]
         else:
             # It's likely a repo/chart format
             clone_cmd = None
             
-        # Helm install/upgrade command
-        install_cmd = f"{self.helm_binary} upgrade --install {release_name} {chart_path} --namespace {namespace} {values_args} {context_part}"
+        # Helm install/upgrade command; --create-namespace makes sure the
+        # namespace exists without piping kubectl output through a shell
+        install_cmd = [self.helm_binary, 'upgrade', '--install', release_name, chart_path,
+                       '--namespace', deployment.namespace, '--create-namespace', *values_args, *helm_context]
         
         # Verification command
-        verify_cmd = f"{self.kubectl_binary} {context_part} -n {namespace} get pods"
+        verify_cmd = [self.kubectl_binary, *kubectl_context, '-n', deployment.namespace, 'get', 'pods']
         
         commands = {
-            "create_namespace": create_ns_cmd,
             "install_chart": install_cmd,
             "verify_deployment": verify_cmd
         }
@@ -358,37 +586,97 @@ Ensure that any connection parameters from cluster_details (like kubeconfig path
             
         return commands
 
-    def _verify_deployment(self, namespace: str, release_name: str) -> Dict[str, Any]:
+    def _prepare_values(self, helm_values: Any) -> Tuple[List[str], Optional[IO[str]]]:
+        """
+        Builds the Helm arguments that pass helm_values to the install.
+
+        Args:
+            helm_values: Path to a values file, a dictionary or JSON string of
+                values, or an inline --set string
+
+        Returns:
+            The Helm arguments and the temporary values file, if any, which the
+            caller closes to delete it
+        """
+        if not helm_values:
+            return [], None
+
+        if isinstance(helm_values, str):
+            if os.path.isfile(helm_values):
+                # If helm_values is a path to an existing file
+                return ['--values', helm_values], None
+            try:
+                helm_values = json.loads(helm_values)
+            except json.JSONDecodeError:
+                # If not valid JSON, treat as inline values string
+                return ['--set', helm_values], None
+
+        if not isinstance(helm_values, dict) or not helm_values:
+            return [], None
+
+        leaves = list(self._flatten_values(helm_values))
+        if len(leaves) <= _INLINE_VALUES_MAX_LEAVES:
+            # --set-json keeps each value's JSON type, unlike --set which guesses it
+            values_args = []
+            for path, value in leaves:
+                values_args += ['--set-json', f"{path}={json.dumps(value)}"]
+            return values_args, None
+
+        values_file = tempfile.NamedTemporaryFile('w', prefix='values-', suffix='.yaml')
+        try:
+            if yaml is not None:
+                yaml.dump(helm_values, values_file, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper))
+            else:
+                json.dump(helm_values, values_file)
+            values_file.flush()
+        except Exception:
+            values_file.close()
+            raise
+        return ['--values', values_file.name], values_file
+
+    @classmethod
+    def _flatten_values(cls, values: Dict[str, Any], prefix: str = ''):
+        """
+        Yields (Helm key path, value) for every leaf of values; lists and empty
+        dictionaries are leaves
+        """
+        for key, value in values.items():
+            # Helm splits key paths on dots, so literal dots in keys are escaped
+            path = prefix + str(key).replace('.', '\\.')
+            if isinstance(value, dict) and value:
+                yield from cls._flatten_values(value, path + '.')
+            else:
+                yield path, value
+
+    def _verify_deployment(self, namespace: str, release_name: str,
+                           env: Optional[Dict[str, str]] = None, context: Optional[str] = None,
+                           shared_client: bool = True) -> Dict[str, Any]:
         """
         Verify that the deployment was successful.
         
         Args:
             namespace: Kubernetes namespace
             release_name: Helm release name
+            env: Environment for the helm/kubectl calls, as built by _prepare_kubeconfig
+            context: Optional kubeconfig context of the target cluster
+            shared_client: Whether the Kubernetes API client may be kept for later
+                verifications; False for temporary kubeconfigs
         
         Returns:
             Dictionary with verification status and details
         """
         try:
-            # Check Helm release status
-            helm_status_cmd = f"{self.helm_binary} status {release_name} -n {namespace}"
-            helm_status = subprocess.check_output(helm_status_cmd, shell=True).decode()
-            
-            # Check pods status
-            pods_cmd = f"{self.kubectl_binary} get pods -n {namespace} -l app.kubernetes.io/instance={release_name} -o json"
-            pods_output = subprocess.check_output(pods_cmd, shell=True).decode()
-            pods_data = json.loads(pods_output)
-            
-            all_pods_ready = True
-            pod_statuses = []
-            
-            for pod in pods_data.get('items', []):
-                pod_name = pod['metadata']['name']
-                pod_status = pod['status']['phase']
-                pod_statuses.append({"name": pod_name, "status": pod_status})
-                
-                if pod_status != 'Running':
-                    all_pods_ready = False
+            helm_status = pod_statuses = None
+            if k8s_client is not None:
+                try:
+                    helm_status, pod_statuses = self._read_deployment_state(
+                        namespace, release_name, env, context, shared_client
+                    )
+                except k8s_config.ConfigException as e:
+                    logger.warning("No Kubernetes API configuration (%s), verifying with helm and kubectl", e)
+            if pod_statuses is None:
+                helm_status, pod_statuses = self._run_deployment_checks(namespace, release_name, env, context)
+            all_pods_ready = all(pod["status"] == 'Running' for pod in pod_statuses)
             
             return {
                 "status": "success" if all_pods_ready else "warning",
@@ -406,4 +694,90 @@ Ensure that any connection parameters from cluster_details (like kubeconfig path
             return {
                 "status": "error",
                 "message": f"Error verifying deployment: {str(e)}"
-            }
\ No newline at end of file
+            }
+
+    @classmethod
+    def _k8s_api_client(cls, kubeconfig: Optional[str], context: Optional[str], shared: bool):
+        """
+        Returns a Kubernetes API client for kubeconfig and context, loading the
+        config only the first time a shared client is requested
+        """
+        if not shared:
+            return cls._new_k8s_api_client(kubeconfig, context)
+
+        key = (kubeconfig, context)
+        with cls._k8s_api_clients_lock:
+            api_client = cls._k8s_api_clients.get(key)
+            if api_client is None:
+                api_client = cls._new_k8s_api_client(kubeconfig, context)
+                cls._k8s_api_clients[key] = api_client
+            return api_client
+
+    @staticmethod
+    def _new_k8s_api_client(kubeconfig: Optional[str], context: Optional[str]):
+        """
+        Builds a Kubernetes API client from kubeconfig, or from the default
+        kubeconfig when it is None. Without any kubeconfig file the pod's
+        service account is used, as kubectl does when running in-cluster.
+        Raises ConfigException when neither is available.
+        """
+        default_kubeconfig = os.path.expanduser(k8s_config.KUBE_CONFIG_DEFAULT_LOCATION)
+        if kubeconfig is None and context is None and not os.path.exists(default_kubeconfig):
+            configuration = k8s_client.Configuration()
+            k8s_config.load_incluster_config(client_configuration=configuration)
+            return k8s_client.ApiClient(configuration)
+        return k8s_config.new_client_from_config(config_file=kubeconfig, context=context)
+
+    def _read_deployment_state(self, namespace: str, release_name: str, env: Optional[Dict[str, str]],
+                               context: Optional[str], shared_client: bool) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        Reads the Helm release status with helm and the release's pods through
+        the Kubernetes API. Raises ConfigException, before running anything,
+        when the API is not configured.
+        """
+        kubeconfig = env.get('KUBECONFIG') if env else None
+        api_client = self._k8s_api_client(kubeconfig, context, shared_client)
+        try:
+            # helm status keeps its usual output and needs no access to Helm's release secrets here
+            helm_status = self._helm_status(namespace, release_name, env, context)
+
+            pods = k8s_client.CoreV1Api(api_client).list_namespaced_pod(
+                namespace, label_selector=f"app.kubernetes.io/instance={release_name}"
+            ).items
+            pod_statuses = [{"name": pod.metadata.name, "status": pod.status.phase} for pod in pods]
+            return helm_status, pod_statuses
+        finally:
+            if not shared_client:
+                api_client.close()
+
+    def _helm_status(self, namespace: str, release_name: str, env: Optional[Dict[str, str]],
+                     context: Optional[str]) -> str:
+        """
+        Returns the output of helm status for the release
+        """
+        helm_context = [f"--kube-context={context}"] if context else []
+        helm_status_cmd = [self.helm_binary, 'status', release_name, '-n', namespace, *helm_context]
+        return subprocess.check_output(helm_status_cmd, env=env).decode()
+
+    def _run_deployment_checks(self, namespace: str, release_name: str, env: Optional[Dict[str, str]],
+                               context: Optional[str]) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        Reads the Helm release status and the release's pods with the helm and
+        kubectl binaries
+        """
+        kubectl_context = [f"--context={context}"] if context else []
+
+        # Check Helm release status
+        helm_status = self._helm_status(namespace, release_name, env, context)
+        
+        # Check pods status
+        pods_cmd = [self.kubectl_binary, *kubectl_context, 'get', 'pods', '-n', namespace,
+                    '-l', f"app.kubernetes.io/instance={release_name}", '-o', 'json']
+        # Parsed straight from the output bytes, without decoding to str first
+        pods_data = _json_loads(subprocess.check_output(pods_cmd, env=env))
+        
+        pod_statuses = [
+            {"name": pod['metadata']['name'], "status": pod['status']['phase']}
+            for pod in pods_data.get('items', ())
+        ]
+        return helm_status, pod_statuses
@@ -0,0 +1,24 @@
+from agents.utils.validation import RequestValidator, RequiredFields
+
+# Fields every deploy request must provide
+REQUIRED_FIELDS = RequiredFields('repository', 'namespace')
+
+# Fields SmolDeployAgent.process_deployment_task needs; /execute fills in an
+# empty cluster_details when the request has none
+TASK_REQUIRED_FIELDS = RequiredFields('repository', 'namespace', 'cluster_details')
+
+# (field, type(s), error) for each optional field, checked in this order
+_FIELD_TYPES = (
+    ('service_ports', list, "service_ports must be a list"),
+    ('environment_variables', dict, "environment_variables must be a dictionary"),
+    ('cluster_details', dict, "cluster_details must be a dictionary"),
+    ('helm_values', (dict, str), "helm_values must be a dictionary or a string path to a values file"),
+)
+
+_validator = RequestValidator(REQUIRED_FIELDS, _FIELD_TYPES, report_all_missing=True)
+
+def validate_deploy_request(data):
+    """
+    Validate incoming deployment request data
+    """
+    return _validator(data)
@@ -1,222 +1,283 @@
 import sys
 import os
-from flask import Blueprint, request, jsonify, Flask
+from flask import Blueprint, request, jsonify, Flask, Response
+from werkzeug.exceptions import RequestEntityTooLarge
 from agents.utils.logger import setup_agent_logger
+from agents.utils.json_provider import ORJSONProvider, encode_body, parse_json_body
+from agents.utils.database import database_uri, engine_options
+from agents.utils.server import run_app
 from prometheus_flask_exporter import PrometheusMetrics
 import subprocess
+import shutil
 import logging
 import json
-from prometheus_client import REGISTRY, Collector
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from prometheus_client import CollectorRegistry
 from agents.helm_agent.smol_helm_agent import SmolHelmAgent
+from agents.helm_agent.utils import validate_helm_request
 
 # Set up logger
 logger = setup_agent_logger('helm-agent')
 
-# Initialize the SmolHelmAgent
-smol_helm_agent = SmolHelmAgent(api_key=os.environ.get('OPENAI_API_KEY'))
+# The SmolHelmAgent is built by the first /execute request, so importing the
+# module or probing /health never depends on the LLM backend
+_smol_helm_agent = None
+_smol_helm_agent_lock = threading.Lock()
 
-def validate_helm_request(data):
+def _get_smol_helm_agent():
     """
-    Validate incoming Helm chart request data
+    Returns the shared SmolHelmAgent, creating it on first use
     """
-    if not isinstance(data, dict):
-        return False, "Invalid request format"
+    global _smol_helm_agent
+    if _smol_helm_agent is None:
+        with _smol_helm_agent_lock:
+            if _smol_helm_agent is None:
+                _smol_helm_agent = SmolHelmAgent(api_key=os.environ.get('OPENAI_API_KEY'))
+    return _smol_helm_agent
 
-    if 'parameters' not in data:
-        return False, "Missing parameters field"
+_HEALTH_TTL = 60
+_HEALTH_CACHE = {"ts": None, "body": None, "status_code": None}
+_health_lock = threading.Lock()
 
-    params = data['parameters']
-    required_fields = ['repository', 'app_name', 'namespace']
+# The version probes spend their time waiting on process startup, so they run
+# side by side; a probe that has not answered within the timeout counts as failed
+_PROBE_TIMEOUT = 2.0
+_probe_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='helm-agent-probe')
 
-    for field in required_fields:
-        if field not in params:
-            return False, f"Missing required field: {field}"
+# Version output of each tool command that has succeeded once; an installed
+# binary does not change under the running process, so it is executed only once
+_TOOL_VERSIONS = {}
 
-    # Optional field validations
-    if 'service_ports' in params and not isinstance(params['service_ports'], list):
-        return False, "service_ports must be a list"
+def _tool_version(command):
+    """
+    Returns the version output of a tool, or None if it is not on PATH or fails
+    """
+    if shutil.which(command[0]) is None:
+        return None
+
+    key = tuple(command)
+    version = _TOOL_VERSIONS.get(key)
+    if version is None:
+        try:
+            version = subprocess.run(command, capture_output=True, text=True,
+                                     timeout=_PROBE_TIMEOUT, check=True).stdout.strip()
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError):
+            return None
+        _TOOL_VERSIONS[key] = version
+    return version
+
+def _check_dependencies():
+    """
+    Checks git, helm and the OpenAI API key and returns the /health payload
+    and status code
+    """
+    git_future = _probe_pool.submit(_tool_version, ["git", "--version"])
+    helm_future = _probe_pool.submit(_tool_version, ["helm", "version"])
+    wait((git_future, helm_future), timeout=_PROBE_TIMEOUT)
 
-    if 'environment_variables' in params and not isinstance(params['environment_variables'], dict):
-        return False, "environment_variables must be a dictionary"
+    # Check git command availability
+    git_output = git_future.result() if git_future.done() else None
+    git_available = git_output is not None
+    if not git_available:
+        logger.error("Git command not available")
+
+    # Check helm command availability
+    helm_output = helm_future.result() if helm_future.done() else None
+    helm_available = helm_output is not None
+    if not helm_available:
+        logger.error("Helm command not available")
         
-    if 'branch' in params and not isinstance(params['branch'], str):
-        return False, "branch must be a string"
+    # Check OpenAI API key
+    openai_key_available = os.environ.get('OPENAI_API_KEY') is not None
 
-    return True, None
+    # Check if all required tools are available
+    all_available = git_available and helm_available and openai_key_available
+    
+    if not all_available:
+        status_code = 500
+        status = "unhealthy"
+        
+        # Build error message
+        error_messages = []
+        if not git_available:
+            error_messages.append("Git command not available")
+        if not helm_available:
+            error_messages.append("Helm command not available")
+        if not openai_key_available:
+            error_messages.append("OpenAI API key not set")
+            
+        error_message = "; ".join(error_messages)
+    else:
+        status_code = 200
+        status = "healthy"
+        error_message = None
 
-def register_routes_for_app(blueprint):
+    return {
+        "status": status,
+        "service": "helm-agent",
+        "git_available": git_available,
+        "git_version": git_output if git_available else None,
+        "helm_available": helm_available,
+        "helm_version": helm_output if helm_available else None,
+        "openai_key_available": openai_key_available,
+        "error": error_message
+    }, status_code
+
+def _health_body():
     """
-    Register all routes with the provided blueprint
+    Returns the serialized /health payload and status code, re-checking at
+    most once per _HEALTH_TTL so probes in between skip the subprocesses
     """
-    @blueprint.route('/health')
-    def health():
-        """
-        Health check endpoint that also verifies access to required tools (helm, git)
-        """
-        try:
-            # Check git command availability
-            try:
-                git_output = subprocess.check_output(["git", "--version"]).decode().strip()
-                git_available = True
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                git_available = False
-                git_output = "Git command not available"
-                logger.error(git_output)
-
-            # Check helm command availability
-            try:
-                helm_output = subprocess.check_output(["helm", "version"]).decode().strip()
-                helm_available = True
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                helm_available = False
-                helm_output = "Helm command not available"
-                logger.error(helm_output)
-                
-            # Check OpenAI API key
-            openai_key_available = os.environ.get('OPENAI_API_KEY') is not None
-
-            # Check if all required tools are available
-            all_available = git_available and helm_available and openai_key_available
-            
-            if not all_available:
-                status_code = 500
-                status = "unhealthy"
-                
-                # Build error message
-                error_messages = []
-                if not git_available:
-                    error_messages.append("Git command not available")
-                if not helm_available:
-                    error_messages.append("Helm command not available")
-                if not openai_key_available:
-                    error_messages.append("OpenAI API key not set")
-                    
-                error_message = "; ".join(error_messages)
-            else:
-                status_code = 200
-                status = "healthy"
-                error_message = None
+    with _health_lock:
+        now = time.monotonic()
+        checked_at = _HEALTH_CACHE["ts"]
+        if checked_at is not None and now - checked_at < _HEALTH_TTL:
+            return _HEALTH_CACHE["body"], _HEALTH_CACHE["status_code"]
 
-            return jsonify({
-                "status": status,
-                "service": "helm-agent",
-                "git_available": git_available,
-                "git_version": git_output if git_available else None,
-                "helm_available": helm_available,
-                "helm_version": helm_output if helm_available else None,
-                "openai_key_available": openai_key_available,
-                "error": error_message
-            }), status_code
-        except Exception as e:
-            logger.error(f"Health check failed: {str(e)}")
-            return jsonify({
-                "status": "unhealthy",
-                "service": "helm-agent",
-                "error": str(e)
-            }), 500
+        payload, status_code = _check_dependencies()
+        body = encode_body(payload)
+        _HEALTH_CACHE.update(ts=now, body=body, status_code=status_code)
+        return body, status_code
+
+# /execute's rejections that never vary, serialized once at import
+_PAYLOAD_TOO_LARGE_BODY = encode_body({"status": "error", "message": "Payload too large"})
+_NO_DATA_BODY = encode_body({"status": "error", "message": "No data provided"})
+_INVALID_JSON_BODY = encode_body({"status": "error", "message": "Invalid JSON body"})
+
+def _json_response(body, status_code):
+    return Response(body, status=status_code, mimetype='application/json')
+
+def _payload_too_large(error=None):
+    return _json_response(_PAYLOAD_TOO_LARGE_BODY, 413)
+
+# Helm chart requests carry a handful of parameters; anything larger is not parsed
+_MAX_REQUEST_BYTES = 64 * 1024
+
+def health():
+    """
+    Health check endpoint that also verifies access to required tools (helm, git)
+    """
+    try:
+        body, status_code = _health_body()
+        return _json_response(body, status_code)
+    except Exception as e:
+        logger.error("Health check failed: %s", e)
+        return jsonify({
+            "status": "unhealthy",
+            "service": "helm-agent",
+            "error": str(e)
+        }), 500
 
-    @blueprint.route('/execute', methods=['POST'])
-    def execute():
+def execute():
+    try:
+        # The body is read and parsed once (by orjson through the app's JSON provider) and not kept.
+        # MAX_CONTENT_LENGTH rejects oversized bodies before they are parsed, chunked ones included
         try:
-            data = request.get_json()
-            if not data:
-                return jsonify({
-                    "status": "error",
-                    "message": "No data provided"
-                }), 400
-
-            # Validate request
-            is_valid, error_message = validate_helm_request(data)
-            if not is_valid:
-                logger.error(f"Invalid request: {error_message}")
-                return jsonify({
-                    "status": "error",
-                    "message": error_message
-                }), 400
-
-            # Extract parameters
-            params = data['parameters']
-            repository = params['repository']
-            app_name = params['app_name']
-            namespace = params['namespace']
-            
-            # Log optional parameters if present
-            if 'service_ports' in params:
-                logger.debug(f"Service ports: {params['service_ports']}")
-            if 'environment_variables' in params:
-                logger.debug(f"Environment variables: {params['environment_variables']}")
-            if 'branch' in params:
-                logger.debug(f"Branch: {params['branch']}")
-
-            logger.info(f"Creating Helm chart for {repository} as {app_name} in namespace {namespace}")
-            
-            # Process the task using SmolHelmAgent
-            result = smol_helm_agent.process_helm_task(data)
-            
-            # Log the result
-            if result["status"] == "success":
-                logger.info(f"Successfully created Helm chart for {repository}")
-            else:
-                logger.error(f"Failed to create Helm chart for {repository}: {result.get('message', 'Unknown error')}")
-            
-            return jsonify(result)
+            data = parse_json_body(request)
+        except RequestEntityTooLarge:
+            return _payload_too_large()
+        except ValueError as e:
+            logger.error("Invalid JSON body: %s", e)
+            return _json_response(_INVALID_JSON_BODY, 400)
+        if not data:
+            return _json_response(_NO_DATA_BODY, 400)
 
-        except subprocess.CalledProcessError as e:
-            error_msg = f"Command execution failed: {str(e)}"
-            logger.error(error_msg)
-            return jsonify({
-                "status": "error",
-                "message": error_msg,
-                "details": {
-                    "command": e.cmd,
-                    "exit_code": e.returncode,
-                    "output": e.output.decode() if e.output else None
-                }
-            }), 500
-        except Exception as e:
-            logger.error(f"Error creating Helm chart: {str(e)}")
+        # Validate request
+        is_valid, error_message = validate_helm_request(data)
+        if not is_valid:
+            logger.error("Invalid request: %s", error_message)
             return jsonify({
                 "status": "error",
-                "message": f"Failed to create Helm chart: {str(e)}"
-            }), 500
-    
+                "message": error_message
+            }), 400
+
+        # Extract parameters
+        params = data['parameters']
+        repository = params['repository']
+        app_name = params['app_name']
+        namespace = params['namespace']
+
+        # Log optional parameters if present
+        if 'service_ports' in params:
+            logger.debug("Service ports: %s", params['service_ports'])
+        if 'environment_variables' in params:
+            logger.debug("Environment variables: %s", params['environment_variables'])
+        if 'branch' in params:
+            logger.debug("Branch: %s", params['branch'])
+
+        logger.info("Creating Helm chart for %s as %s in namespace %s", repository, app_name, namespace)
+
+        # Process the task using SmolHelmAgent
+        result = _get_smol_helm_agent().process_helm_task(data)
+
+        # Log the result
+        if result["status"] == "success":
+            logger.info("Successfully created Helm chart for %s", repository)
+        else:
+            logger.error("Failed to create Helm chart for %s: %s", repository, result.get('message', 'Unknown error'))
+
+        return jsonify(result)
+
+    except subprocess.CalledProcessError as e:
+        error_msg = f"Command execution failed: {str(e)}"
+        logger.error(error_msg)
+        return jsonify({
+            "status": "error",
+            "message": error_msg,
+            "details": {
+                "command": e.cmd,
+                "exit_code": e.returncode,
+                "output": e.output.decode() if e.output else None
+            }
+        }), 500
+    except Exception as e:
+        logger.error("Error creating Helm chart: %s", e)
+        return jsonify({
+            "status": "error",
+            "message": f"Failed to create Helm chart: {str(e)}"
+        }), 500
+
+def register_routes_for_app(blueprint):
+    """
+    Register all routes with the provided blueprint
+    """
+    blueprint.add_url_rule('/health', view_func=health)
+    blueprint.add_url_rule('/execute', view_func=execute, methods=['POST'])
+
     # Return the blueprint with routes registered
     return blueprint
 
+# Database settings come from the environment, which does not change once the process starts
+_DATABASE_URI = database_uri()
+_ENGINE_OPTIONS = engine_options()
+
 def create_app():
     app = Flask(__name__)
+    app.json = ORJSONProvider(app)
     
     # Database configuration
-    database_url = os.environ.get('DATABASE_URL')
-    if database_url and database_url.startswith('postgres://'):
-        database_url = database_url.replace('postgres://', 'postgresql://', 1)
-
-    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_DATABASE_URI'] = _DATABASE_URI
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'pool_recycle': 300,
-        'pool_pre_ping': True,
-        'connect_args': {
-            'sslmode': 'require' if os.environ.get('POSTGRES_SSL', 'true').lower() == 'true' else 'prefer'
-        }
-    }
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(_ENGINE_OPTIONS)
+
+    # Werkzeug enforces the limit while the body is read, including chunked bodies
+    # that carry no Content-Length
+    app.config['MAX_CONTENT_LENGTH'] = _MAX_REQUEST_BYTES
+    app.register_error_handler(RequestEntityTooLarge, _payload_too_large)
     
-    # Initialize metrics with registry_name to avoid collisions
-    # Create a separate registry to avoid collisions with the main app
-    try:
-        # Try to unregister the app_info metric if it exists to avoid duplicates
-        for collector in list(REGISTRY._collector_to_names.keys()):
-            if 'app_info' in REGISTRY._collector_to_names.get(collector, []):
-                REGISTRY.unregister(collector)
-                logger.info("Unregistered existing app_info metric")
-                break
-                
-        metrics = PrometheusMetrics(app, registry_name='helm_agent_registry')
-        metrics.info('helm_agent_info', 'Application info', version='1.0.0', service='helm_agent')
-    except Exception as e:
-        logger.warning(f"Prometheus metrics initialization error: {str(e)}")
-        # Create metrics without info to avoid errors
-        metrics = PrometheusMetrics(app, registry_name='helm_agent_registry')
+    # Each app exports its own registry, so repeated create_app calls never
+    # collide on metric names in the process-wide default registry
+    # Request metrics are labelled by endpoint, and health probes are left out
+    # of the per-request hooks
+    metrics = PrometheusMetrics(
+        app,
+        registry=CollectorRegistry(),
+        group_by='endpoint',
+        excluded_paths=['^/health$']
+    )
+    metrics.info('helm_agent_info', 'Application info', version='1.0.0', service='helm_agent')
     
     # Create and register the blueprint
     helm_agent_bp = Blueprint('helm_agent', __name__)
@@ -233,4 +294,4 @@ def create_app():
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=9002, debug=True)
\ No newline at end of file
+    run_app(app, port=9002)
\ No newline at end of file
@@ -19,6 +19,9 @@ import yaml
 import openai
 from openai import OpenAI
 
+from agents.helm_agent.utils import REQUIRED_FIELDS
+from agents.utils.openai_client import shared_openai_client
+
 logger = logging.getLogger(__name__)
 
 class SmolHelmAgent:
@@ -37,8 +40,12 @@ class SmolHelmAgent:
         """
         self.api_key = api_key or os.environ.get('OPENAI_API_KEY')
         self.model = model
-        self.client = OpenAI(api_key=self.api_key)
-        
+
+    @property
+    def client(self) -> OpenAI:
+        """The shared OpenAI client, created the first time a chart is generated."""
+        return shared_openai_client(self.api_key)
+
     def clone_repository(self, repository_url: str, branch: str = "main") -> str:
         """
         Clone a repository to a temporary directory.
@@ -386,9 +393,7 @@ Include appropriate resource requests and limits, liveness and readiness probes,
                 return {"status": "error", "message": "Missing parameters field"}
 
             params = task_data['parameters']
-            required_fields = ['repository', 'app_name', 'namespace']
-            missing_fields = [field for field in required_fields if field not in params]
-            
+            missing_fields = REQUIRED_FIELDS.missing(params)
             if missing_fields:
                 return {
                     "status": "error", 
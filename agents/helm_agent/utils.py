@@ -0,0 +1,19 @@
+from agents.utils.validation import RequestValidator, RequiredFields
+
+# Fields every Helm chart request must provide
+REQUIRED_FIELDS = RequiredFields('repository', 'app_name', 'namespace')
+
+# (field, type, error) for each optional field, checked in this order
+_FIELD_TYPES = (
+    ('service_ports', list, "service_ports must be a list"),
+    ('environment_variables', dict, "environment_variables must be a dictionary"),
+    ('branch', str, "branch must be a string"),
+)
+
+_validator = RequestValidator(REQUIRED_FIELDS, _FIELD_TYPES)
+
+def validate_helm_request(data):
+    """
+    Validate incoming Helm chart request data
+    """
+    return _validator(data)
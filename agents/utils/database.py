@@ -0,0 +1,42 @@
+import os
+
+
+def database_uri():
+    """
+    Returns the SQLAlchemy URI for DATABASE_URL, rewriting the legacy
+    postgres:// scheme that SQLAlchemy no longer accepts
+    """
+    url = os.environ.get('DATABASE_URL')
+    if url and url.startswith('postgres://'):
+        url = url.replace('postgres://', 'postgresql://', 1)
+    return url
+
+
+def engine_options():
+    """
+    Builds SQLALCHEMY_ENGINE_OPTIONS for an agent from the environment.
+
+    Long-lived workers get a sized connection pool; with SHORT_LIVED_WORKERS=true
+    the pool is replaced by NullPool so each request opens its own connection.
+    """
+    options = {
+        'connect_args': {
+            'sslmode': 'require' if os.environ.get('POSTGRES_SSL', 'true').lower() == 'true' else 'prefer'
+        }
+    }
+
+    if os.environ.get('SHORT_LIVED_WORKERS', 'false').lower() == 'true':
+        from sqlalchemy.pool import NullPool
+        options['poolclass'] = NullPool
+        return options
+
+    options.update({
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', '10')),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '20')),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', '3')),
+        'pool_recycle': 300,
+        # Pre-ping costs a round trip per checkout; pool_recycle already
+        # retires idle connections, so deployments can turn it off
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+    })
+    return options
@@ -0,0 +1,106 @@
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from flask import jsonify, request
+
+
+class JobQueue:
+    """
+    Runs agent tasks on a bounded thread pool so request handlers can return
+    immediately and let clients poll for the result by job id.
+    """
+
+    def __init__(self, max_workers: int = 4, thread_name_prefix: str = "agent-job",
+                 max_jobs: int = 1000):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix=thread_name_prefix)
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_jobs = max_jobs
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> str:
+        """
+        Queues fn(*args, **kwargs) and returns the id of the new job
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {"state": "queued", "result": None, "error": None}
+            # Forget the oldest jobs once the table is full
+            while len(self._jobs) > self._max_jobs:
+                self._jobs.popitem(last=False)
+
+        self._executor.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns a snapshot of the job state, or None for unknown job ids
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job, job_id=job_id) if job is not None else None
+
+    def _run(self, job_id: str, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        self._update(job_id, state="running")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._update(job_id, state="failed", error=str(e))
+        else:
+            self._update(job_id, state="finished", result=result)
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+
+def wants_async(data: Dict[str, Any]) -> bool:
+    """
+    Returns True if the caller asked for the request to be processed in the background
+    """
+    if request.args.get('async', '').lower() in ('true', '1'):
+        return True
+    return data.get('async') is True
+
+
+def register_job_status_route(blueprint, job_queue: JobQueue, failed_message: str,
+                              pending_message: str) -> None:
+    """
+    Adds GET /execute/<job_id> to the blueprint, reporting the state of jobs
+    queued on job_queue by an asynchronous /execute call. Finished jobs must
+    have returned a (response, status_code) tuple.
+    """
+    def execute_status(job_id):
+        """
+        Returns the state of a job queued by an asynchronous /execute call
+        """
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({
+                "status": "error",
+                "message": f"Unknown job: {job_id}"
+            }), 404
+
+        if job["state"] == "finished":
+            response, status_code = job["result"]
+            return jsonify(dict(response, job_id=job_id)), status_code
+
+        if job["state"] == "failed":
+            return jsonify({
+                "status": "error",
+                "message": f"{failed_message}: {job['error']}",
+                "job_id": job_id
+            }), 500
+
+        return jsonify({
+            "status": job["state"],
+            "message": pending_message,
+            "job_id": job_id
+        }), 202
+
+    blueprint.add_url_rule('/execute/<job_id>', 'execute_status', execute_status)
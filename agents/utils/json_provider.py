@@ -0,0 +1,90 @@
+import json
+import logging
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+logger = logging.getLogger(__name__)
+
+# orjson is optional; without it the provider behaves like Flask's default one
+orjson = None
+
+try:
+    import orjson
+except ImportError:
+    logger.warning("orjson not installed, falling back to the standard json module")
+
+
+def encode_body(obj) -> bytes:
+    """
+    Serializes obj exactly as ORJSONProvider (or, without orjson, Flask's
+    default provider) writes a response body outside debug mode: compact,
+    sorted keys and a trailing newline. For bodies built once ahead of time.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return f"{json.dumps(obj, separators=(',', ':'), sort_keys=True)}\n".encode()
+
+
+def parse_json_body(request):
+    """
+    Reads a request body once, without keeping it on the request, and parses
+    it with the current app's JSON provider. Returns None when the body is
+    empty or not sent as JSON; raises ValueError when it does not parse and
+    RequestEntityTooLarge when it exceeds the app's MAX_CONTENT_LENGTH.
+    """
+    # Chunked requests carry no Content-Length, so emptiness is also checked once read
+    if request.content_length == 0 or not request.is_json:
+        return None
+    body = request.get_data(cache=False)
+    if request.max_content_length is not None and request.content_length is None:
+        # A chunked body is read through a stream capped at MAX_CONTENT_LENGTH, which
+        # Werkzeug 2.3 silently truncates; reading past the cap raises RequestEntityTooLarge
+        request.stream.read(1)
+    if not body:
+        return None
+    return current_app.json.loads(body)
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that serializes and parses with orjson.
+
+    Anything orjson cannot handle (or calls that pass json.dumps-specific
+    keyword arguments) goes through Flask's default implementation.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._orjson_dumps(obj).decode()
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+
+        try:
+            body = self._orjson_dumps(obj, option)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def _orjson_dumps(self, obj, option: int = 0) -> bytes:
+        # Let Flask's default() format dates so responses match the stdlib provider
+        option |= orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
@@ -9,6 +9,10 @@ def setup_agent_logger(agent_name: str):
     logger = logging.getLogger(agent_name)
     logger.setLevel(logging.DEBUG if os.environ.get('DEBUG', 'False').lower() == 'true' else logging.INFO)
     
+    # Already configured by another module of the same agent
+    if logger.handlers:
+        return logger
+    
     # Create handlers
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.DEBUG)
@@ -0,0 +1,27 @@
+import threading
+from typing import Dict, Optional
+
+from openai import OpenAI
+
+# OpenAI clients by API key, shared by every agent instance in the process so
+# their keep-alive connections are reused across requests
+_OPENAI_CLIENTS: Dict[Optional[str], OpenAI] = {}
+_OPENAI_CLIENTS_LOCK = threading.Lock()
+
+
+def shared_openai_client(api_key: Optional[str]) -> OpenAI:
+    """
+    Returns the process-wide OpenAI client for api_key, creating it on first use
+    """
+    with _OPENAI_CLIENTS_LOCK:
+        client = _OPENAI_CLIENTS.get(api_key)
+        if client is None:
+            # httpx is an OpenAI dependency; its pool is sized for concurrent agent requests
+            import httpx
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+                timeout=60.0
+            )
+            client = OpenAI(api_key=api_key, max_retries=3, timeout=60.0, http_client=http_client)
+            _OPENAI_CLIENTS[api_key] = client
+        return client
@@ -0,0 +1,69 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# gunicorn is optional; without it agents fall back to the threaded Werkzeug server
+BaseApplication = None
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    logger.warning("gunicorn not installed, falling back to the Werkzeug server")
+
+
+# gunicorn worker classes that honour worker_connections
+_ASYNC_WORKER_CLASSES = frozenset({'gevent', 'eventlet'})
+
+
+def _default_threads() -> int:
+    return 2 * (os.cpu_count() or 1) + 1
+
+
+def run_app(app, port: int, host: str = '0.0.0.0') -> None:
+    """
+    Serves app with gunicorn when available, otherwise with Werkzeug.
+
+    Agents keep job state and in-flight work in process memory, so the default
+    is a single gthread worker with 2*cpu+1 threads. AGENT_WORKERS,
+    AGENT_THREADS and AGENT_WORKER_CLASS override the defaults.
+    """
+    workers = int(os.environ.get('AGENT_WORKERS', '1'))
+    threads = int(os.environ.get('AGENT_THREADS', str(_default_threads())))
+
+    if BaseApplication is None:
+        app.run(host=host, port=port, threaded=True)
+        return
+
+    worker_class = os.environ.get('AGENT_WORKER_CLASS', 'gthread')
+    options = {
+        'bind': f'{host}:{port}',
+        'workers': workers,
+        'threads': threads,
+        'worker_class': worker_class,
+        'timeout': int(os.environ.get('AGENT_WORKER_TIMEOUT', '300')),
+    }
+    # Only the async workers cap concurrent connections per worker
+    if worker_class in _ASYNC_WORKER_CLASSES:
+        options['worker_connections'] = 1000
+    _GunicornApplication(app, options).run()
+
+
+if BaseApplication is not None:
+    class _GunicornApplication(BaseApplication):
+        """
+        Runs a Flask app object in-process under gunicorn
+        """
+
+        def __init__(self, app, options):
+            self.application = app
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
@@ -0,0 +1,151 @@
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple, Type, Union
+
+logger = logging.getLogger(__name__)
+
+# fastjsonschema is optional; without it requests go straight to the hand-written checks
+fastjsonschema = None
+
+try:
+    import fastjsonschema
+except ImportError:
+    logger.warning("fastjsonschema not installed, validating requests in Python only")
+
+
+def compile_schema(schema: Dict[str, Any]) -> Optional[Callable[[Any], bool]]:
+    """
+    Compiles a JSON schema once into a predicate that returns True for valid
+    data, or returns None when fastjsonschema is not available
+    """
+    if fastjsonschema is None:
+        return None
+
+    validate = fastjsonschema.compile(schema)
+
+    def is_valid(data: Any) -> bool:
+        try:
+            validate(data)
+        except fastjsonschema.JsonSchemaException:
+            return False
+        return True
+
+    return is_valid
+
+
+def shape_key(params: Dict[str, Any]) -> FrozenSet[Tuple[str, type]]:
+    """
+    Returns the (field, value type) pairs of params, a hashable key for
+    validators whose answer depends only on which fields are present and
+    what type each one holds
+    """
+    return frozenset((field, type(value)) for field, value in params.items())
+
+
+class RequiredFields:
+    """
+    The fields a request's parameters must provide, in the order they are reported
+    """
+
+    def __init__(self, *names: str):
+        self.names = names
+        self._name_set = frozenset(names)
+
+    def missing(self, params: Dict[str, Any]) -> List[str]:
+        """
+        Returns the fields params lacks in declaration order, or an empty list
+        """
+        # One set difference for the common case where nothing is missing
+        missing = self._name_set.difference(params)
+        if not missing:
+            return []
+        return [name for name in self.names if name in missing]
+
+
+# JSON schema type of each Python type parsed JSON can hold
+_JSON_TYPES = {dict: "object", list: "array", str: "string"}
+
+# (field, accepted type or types, error) for a field whose type is checked
+FieldType = Tuple[str, Union[Type, Tuple[Type, ...]], str]
+
+
+class RequestValidator:
+    """
+    Validates agent requests of the form {"parameters": {...}}.
+
+    The JSON schema is derived from the field tables and compiled once, so
+    valid requests are accepted in one call. Rejected requests are explained
+    by checks keyed on the shape of their parameters (see shape_key()), and
+    the answer for each shape is cached since clients resend the same one.
+    """
+
+    def __init__(self, required_fields: RequiredFields, field_types: Sequence[FieldType] = (),
+                 report_all_missing: bool = False):
+        """
+        Args:
+            required_fields: Fields every request must provide
+            field_types: Type checks, applied in order to the fields that are present
+            report_all_missing: Report every missing field instead of only the first one
+        """
+        self.required_fields = required_fields
+        self.field_types = tuple(
+            (field, types if isinstance(types, tuple) else (types,), error)
+            for field, types, error in field_types
+        )
+        self.report_all_missing = report_all_missing
+        self._is_valid = compile_schema(self._schema())
+        self._validate_shape = lru_cache(maxsize=256)(self._check_shape)
+
+    def __call__(self, data: Any) -> Tuple[bool, Optional[str]]:
+        """
+        Returns (True, None) for a valid request, otherwise (False, error message)
+        """
+        # Fast path for valid requests; the checks below only run to explain a failure
+        if self._is_valid is not None and self._is_valid(data):
+            return True, None
+
+        if not isinstance(data, dict):
+            return False, "Invalid request format"
+
+        if 'parameters' not in data:
+            return False, "Missing parameters field"
+
+        params = data['parameters']
+        if type(params) is not dict:
+            return False, "parameters must be a dictionary"
+
+        return self._validate_shape(shape_key(params))
+
+    def _schema(self) -> Dict[str, Any]:
+        properties = {}
+        for field, types, _ in self.field_types:
+            json_types = [_JSON_TYPES[t] for t in types]
+            properties[field] = {"type": json_types[0] if len(json_types) == 1 else json_types}
+        return {
+            "type": "object",
+            "required": ["parameters"],
+            "properties": {
+                "parameters": {
+                    "type": "object",
+                    "required": list(self.required_fields.names),
+                    "properties": properties
+                }
+            }
+        }
+
+    def _check_shape(self, shape: FrozenSet[Tuple[str, type]]) -> Tuple[bool, Optional[str]]:
+        field_types = dict(shape)
+
+        fields = self.required_fields.missing(field_types)
+        if fields:
+            if self.report_all_missing:
+                return False, f"Missing required fields: {', '.join(fields)}"
+            return False, f"Missing required field: {fields[0]}"
+
+        # Parsed JSON only ever holds plain list/dict/str, so exact type checks
+        # stand in for isinstance
+        for field, types, error in self.field_types:
+            if field in field_types and field_types[field] not in types:
+                return False, error
+
+        return True, None
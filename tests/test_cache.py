@@ -0,0 +1,44 @@
+import os
+
+from agents.ci_agent.cache import ResultCache, make_key
+
+
+def test_make_key_is_stable_and_separates_parts():
+    assert make_key("a", "b") == make_key("a", "b")
+    assert make_key("ab", "c") != make_key("a", "bc")
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_entries_round_trip_through_disk(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    value = {"project_type": "python", "confidence": 0.9, "build_steps": ["pytest"]}
+    ResultCache(cache_dir=cache_dir).set("key", value)
+
+    # A fresh cache, as after a restart, reads the entry back from disk
+    assert ResultCache(cache_dir=cache_dir).get("key") == value
+
+
+def test_evicted_entries_are_reloaded_from_disk(tmp_path):
+    cache = ResultCache(max_entries=1, cache_dir=str(tmp_path))
+    cache.set("a", [1])
+    cache.set("b", [2])
+
+    assert cache.get("a") == [1]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_unreadable_disk_entry_is_a_miss(tmp_path):
+    (tmp_path / "key.json").write_text("{not json")
+    assert ResultCache(cache_dir=str(tmp_path)).get("key") is None
@@ -0,0 +1,104 @@
+from agents.ci_agent import routes
+from agents.ci_agent.repo_analyzer import RepoAnalyzer
+
+
+class _FakeAnalyzer(RepoAnalyzer):
+    """
+    RepoAnalyzer whose git and network calls are replaced by canned answers
+    """
+
+    def __init__(self, work_dir, head_sha="abc123", file_list=None):
+        super().__init__(llm_url="", work_dir=work_dir)
+        self.head_sha = head_sha
+        self.file_list = file_list
+        self.calls = []
+
+    def resolve_head(self, repo_url, branch="main", timeout=30):
+        self.calls.append(("resolve_head", timeout))
+        return self.head_sha
+
+    def list_remote_files(self, repo_url, branch="main"):
+        self.calls.append(("list_remote_files",))
+        return self.file_list
+
+    def clone_repository(self, repo_url, branch="main", shallow=True, bare=True):
+        self.calls.append(("clone_repository",))
+        return self.work_dir
+
+    def analyze_project_type(self, repo_path=None, file_list=None):
+        self.calls.append(("analyze_project_type",))
+        return {"project_type": "python", "confidence": 0.8, "build_steps": ["pytest"]}
+
+    def get_head_sha(self, repo_path):
+        return self.head_sha
+
+    def cleanup(self, repo_path):
+        self.calls.append(("cleanup",))
+
+
+_REQUEST = {"parameters": {"repository": "https://git.example.com/team/app.git", "branch": "main",
+                           "build_steps": ["test"]}}
+
+
+def test_first_clone_skips_ls_remote(tmp_path):
+    analyzer = _FakeAnalyzer(str(tmp_path))
+    response, status_code = routes.run_ci_pipeline(_REQUEST, analyzer)
+
+    assert status_code == 200
+    assert ("resolve_head", routes._LS_REMOTE_TIMEOUT) not in analyzer.calls
+    assert ("clone_repository",) in analyzer.calls
+
+
+def test_cache_hit_returns_the_same_payload_as_the_miss(tmp_path):
+    analyzer = _FakeAnalyzer(str(tmp_path))
+    miss = routes.run_ci_pipeline(_REQUEST, analyzer)
+
+    analyzer.calls.clear()
+    hit = routes.run_ci_pipeline(_REQUEST, analyzer)
+
+    assert hit == miss
+    assert analyzer.calls == [("resolve_head", routes._LS_REMOTE_TIMEOUT)]
+
+
+def test_response_carries_the_rendered_jenkinsfile(tmp_path):
+    analyzer = _FakeAnalyzer(str(tmp_path))
+    response, status_code = routes.run_ci_pipeline(_REQUEST, analyzer)
+
+    assert status_code == 200
+    assert response["details"]["jenkinsfile"] == analyzer.render_jenkins_file("python")
+    assert response["details"]["jenkinsfile"]
+
+
+def test_github_listing_is_cached_under_the_resolved_head(tmp_path):
+    github_request = {"parameters": dict(_REQUEST["parameters"], repository="https://github.com/team/app")}
+    analyzer = _FakeAnalyzer(str(tmp_path), file_list=["setup.py"])
+    miss = routes.run_ci_pipeline(github_request, analyzer)
+
+    assert ("clone_repository",) not in analyzer.calls
+    assert ("resolve_head", routes._LS_REMOTE_TIMEOUT) in analyzer.calls
+
+    analyzer.calls.clear()
+    assert routes.run_ci_pipeline(github_request, analyzer) == miss
+    assert ("analyze_project_type",) not in analyzer.calls
+
+
+def _client(tmp_path):
+    from flask import Blueprint, Flask
+    from agents.utils.json_provider import ORJSONProvider
+
+    app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+    app.register_blueprint(routes.register_routes(Blueprint('ci_agent', __name__), _FakeAnalyzer(str(tmp_path))))
+    return app.test_client()
+
+
+def test_malformed_json_is_reported_as_invalid(tmp_path):
+    response = _client(tmp_path).post('/execute', data='{"parameters": ', content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json() == {"status": "error", "message": "Invalid JSON body"}
+
+
+def test_missing_body_is_reported_as_no_data(tmp_path):
+    response = _client(tmp_path).post('/execute', data='', content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json() == {"status": "error", "message": "No data provided"}
@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("openai")
+
+from agents.deploy_agent.app import app
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def test_malformed_json_is_reported_as_invalid(client):
+    response = client.post('/execute', data='{"parameters": ', content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json() == {"status": "error", "message": "Invalid JSON body"}
+
+
+@pytest.mark.parametrize("body, content_type", [
+    ("", "application/json"),
+    ("{}", "application/json"),
+    ('{"parameters": {}}', "text/plain"),
+])
+def test_missing_body_is_reported_as_no_data(client, body, content_type):
+    response = client.post('/execute', data=body, content_type=content_type)
+    assert response.status_code == 400
+    assert response.get_json() == {"status": "error", "message": "No data provided"}
+
+
+def test_prebuilt_error_bodies_match_the_json_provider(client):
+    response = client.post('/execute', data='', content_type='application/json')
+    with app.app_context():
+        expected = app.json.response({"status": "error", "message": "No data provided"})
+    assert response.data == expected.data
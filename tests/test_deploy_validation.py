@@ -0,0 +1,36 @@
+import pytest
+
+from agents.deploy_agent.utils import validate_deploy_request
+
+
+def test_valid_request():
+    assert validate_deploy_request({"parameters": {"repository": "r", "namespace": "n"}}) == (True, None)
+
+
+@pytest.mark.parametrize("params, message", [
+    ({}, "Missing required fields: repository, namespace"),
+    ({"namespace": "n"}, "Missing required fields: repository"),
+    ({"repository": "r", "service_ports": [80]}, "Missing required fields: namespace"),
+])
+def test_every_missing_field_is_reported(params, message):
+    assert validate_deploy_request({"parameters": params}) == (False, message)
+
+
+@pytest.mark.parametrize("field, value, message", [
+    ("service_ports", 80, "service_ports must be a list"),
+    ("environment_variables", ["A=1"], "environment_variables must be a dictionary"),
+    ("cluster_details", "prod", "cluster_details must be a dictionary"),
+    ("helm_values", 3, "helm_values must be a dictionary or a string path to a values file"),
+])
+def test_optional_fields_of_the_wrong_type_are_rejected(field, value, message):
+    params = {"repository": "r", "namespace": "n", field: value}
+    assert validate_deploy_request({"parameters": params}) == (False, message)
+
+
+@pytest.mark.parametrize("data, message", [
+    ([], "Invalid request format"),
+    ({}, "Missing parameters field"),
+    ({"parameters": []}, "parameters must be a dictionary"),
+])
+def test_malformed_requests(data, message):
+    assert validate_deploy_request(data) == (False, message)
@@ -0,0 +1,80 @@
+import io
+
+import pytest
+
+pytest.importorskip("openai")
+
+from agents.helm_agent import app as helm_app
+
+
+@pytest.fixture
+def client():
+    return helm_app.app.test_client()
+
+
+def _provider_body(payload):
+    with helm_app.app.app_context():
+        return helm_app.app.json.response(payload).data
+
+
+def test_health_body_matches_the_json_provider(client):
+    response = client.get('/health')
+    assert response.data == _provider_body(response.get_json())
+
+
+def test_malformed_json_is_reported_as_invalid(client):
+    response = client.post('/execute', data='{"parameters": ', content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json() == {"status": "error", "message": "Invalid JSON body"}
+
+
+def test_missing_body_is_reported_as_no_data(client):
+    response = client.post('/execute', data='', content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json() == {"status": "error", "message": "No data provided"}
+
+
+@pytest.mark.parametrize("body, message", [
+    ("", "No data provided"),
+    ('{"parameters": ', "Invalid JSON body"),
+    ('{"parameters": {}}', "Missing required field: repository"),
+])
+def test_error_bodies_match_the_json_provider(client, body, message):
+    response = client.post('/execute', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert response.data == _provider_body({"status": "error", "message": message})
+
+
+def _oversized_body():
+    return b'{"parameters": {"repository": "' + b"x" * helm_app._MAX_REQUEST_BYTES + b'"}}'
+
+
+def test_oversized_body_is_rejected(client):
+    response = client.post('/execute', data=_oversized_body(), content_type='application/json')
+    assert response.status_code == 413
+    assert response.data == _provider_body({"status": "error", "message": "Payload too large"})
+
+
+def test_oversized_chunked_body_is_rejected(client):
+    # A chunked request carries no Content-Length; the server marks its input as terminated
+    response = client.post(
+        '/execute',
+        input_stream=io.BytesIO(_oversized_body()),
+        content_type='application/json',
+        headers={'Transfer-Encoding': 'chunked'},
+        environ_overrides={'wsgi.input_terminated': True},
+    )
+    assert response.status_code == 413
+    assert response.data == _provider_body({"status": "error", "message": "Payload too large"})
+
+
+def test_small_chunked_body_is_parsed(client):
+    response = client.post(
+        '/execute',
+        input_stream=io.BytesIO(b'{"parameters": {}}'),
+        content_type='application/json',
+        headers={'Transfer-Encoding': 'chunked'},
+        environ_overrides={'wsgi.input_terminated': True},
+    )
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Missing required field: repository"
@@ -0,0 +1,87 @@
+import threading
+
+from flask import Blueprint, Flask, jsonify, request
+
+from agents.utils.jobs import JobQueue, register_job_status_route, wants_async
+
+
+def _make_app(job_queue, fn):
+    blueprint = Blueprint('jobs_test', __name__)
+
+    @blueprint.route('/execute', methods=['POST'])
+    def execute():
+        data = request.get_json()
+        if wants_async(data):
+            return jsonify({"status": "accepted", "job_id": job_queue.submit(fn, data)}), 202
+        response, status_code = fn(data)
+        return jsonify(response), status_code
+
+    register_job_status_route(blueprint, job_queue, failed_message="Failed to run job",
+                              pending_message="Job is still being processed")
+
+    app = Flask(__name__)
+    app.register_blueprint(blueprint)
+    return app
+
+
+def test_async_request_is_accepted_and_polled_until_finished():
+    release = threading.Event()
+
+    def run(data):
+        release.wait(5)
+        return {"status": "success", "echo": data["value"]}, 201
+
+    job_queue = JobQueue(max_workers=1)
+    client = _make_app(job_queue, run).test_client()
+
+    accepted = client.post('/execute?async=true', json={"value": 7})
+    assert accepted.status_code == 202
+    job_id = accepted.get_json()["job_id"]
+
+    pending = client.get(f'/execute/{job_id}')
+    assert pending.status_code == 202
+    assert pending.get_json()["status"] in ("queued", "running")
+    assert pending.get_json()["message"] == "Job is still being processed"
+
+    release.set()
+    job_queue._executor.shutdown(wait=True)
+
+    finished = client.get(f'/execute/{job_id}')
+    assert finished.status_code == 201
+    assert finished.get_json() == {"status": "success", "echo": 7, "job_id": job_id}
+
+
+def test_failed_job_is_reported_as_500():
+    def run(data):
+        raise RuntimeError("boom")
+
+    job_queue = JobQueue(max_workers=1)
+    client = _make_app(job_queue, run).test_client()
+
+    job_id = client.post('/execute', json={"async": True}).get_json()["job_id"]
+    job_queue._executor.shutdown(wait=True)
+
+    failed = client.get(f'/execute/{job_id}')
+    assert failed.status_code == 500
+    assert failed.get_json()["message"] == "Failed to run job: boom"
+
+
+def test_unknown_job_is_404():
+    client = _make_app(JobQueue(max_workers=1), lambda data: ({}, 200)).test_client()
+    assert client.get('/execute/missing').status_code == 404
+
+
+def test_sync_request_without_async_flag():
+    client = _make_app(JobQueue(max_workers=1), lambda data: ({"ok": True}, 200)).test_client()
+    response = client.post('/execute?async=false', json={"async": "yes"})
+    assert response.status_code == 200
+    assert response.get_json() == {"ok": True}
+
+
+def test_oldest_jobs_are_forgotten():
+    job_queue = JobQueue(max_workers=1, max_jobs=2)
+    job_ids = [job_queue.submit(lambda: None) for _ in range(3)]
+    job_queue._executor.shutdown(wait=True)
+
+    assert job_queue.get(job_ids[0]) is None
+    assert job_queue.get(job_ids[2])["state"] == "finished"
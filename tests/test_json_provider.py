@@ -0,0 +1,23 @@
+from flask import Flask
+
+from agents.utils import json_provider
+from agents.utils.json_provider import ORJSONProvider, encode_body
+
+_PAYLOAD = {"status": "error", "message": "No data provided", "details": {"b": [1, 2], "a": None}}
+
+
+def _provider_body(payload):
+    app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+    with app.app_context():
+        return app.json.response(payload).data
+
+
+def test_encode_body_matches_provider_responses():
+    assert encode_body(_PAYLOAD) == _provider_body(_PAYLOAD)
+
+
+def test_encode_body_matches_provider_responses_without_orjson(monkeypatch):
+    monkeypatch.setattr(json_provider, "orjson", None)
+    assert encode_body(_PAYLOAD) == _provider_body(_PAYLOAD)
+    assert encode_body(_PAYLOAD).endswith(b"\n")
@@ -0,0 +1,132 @@
+import asyncio
+import itertools
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from agents.ci_agent.repo_analyzer import (
+    IncrementalDetector,
+    RepoAnalyzer,
+    _JSONObjectScanner,
+    _detect_from_flags,
+    _marker_flags,
+)
+
+# Root-level files first, as RepoAnalyzer.iter_files yields them
+_TREES = [
+    ["package.json", "src/App.tsx", "src/index.js"],
+    ["package.json", "angular.json", "src/main.ts"],
+    ["package.json", "README.md", "docs/guide.md"],
+    ["requirements.txt", "app/wsgi.py", "app/views.py"],
+    ["setup.py", "src/flask_app/__init__.py"],
+    ["pyproject.toml", "README.md"],
+    ["pom.xml", "src/main/java/App.java"],
+    ["build.gradle.kts", "app/src/Main.kt"],
+    ["README.md", "Service/Service.csproj", "Service/Views/Home.cshtml"],
+    ["README.md", "Library/Library.csproj", "Library/Class1.cs"],
+    ["index.html", "css/site.css"],
+    ["index.html", "package.json", "src/components/Card.vue"],
+    ["README.md", "docs/index.html"],
+    [],
+]
+
+
+def _early_stop_result(paths):
+    detector = IncrementalDetector()
+    for path in paths:
+        if detector.observe(path):
+            break
+    return detector.result()
+
+
+@pytest.mark.parametrize("paths", _TREES)
+def test_detector_early_stop_matches_full_scan(paths):
+    project_type, confidence, build_steps = _detect_from_flags(_marker_flags(paths))
+    assert _early_stop_result(paths) == (project_type, confidence, list(build_steps))
+
+
+def test_detector_early_stop_matches_full_scan_for_marker_combinations():
+    roots = ["package.json", "requirements.txt", "pom.xml", "build.gradle", "index.html", "LICENSE"]
+    nested = ["web/App.jsx", "web/Card.vue", "web/app.angular.json", "api/wsgi.py",
+              "api/flask_routes.py", "svc/svc.csproj", "svc/Page.razor", "docs/notes.md"]
+    for root_count in range(3):
+        for root_files in itertools.combinations(roots, root_count):
+            for nested_files in itertools.combinations(nested, 2):
+                paths = [*root_files, *nested_files]
+                project_type, confidence, build_steps = _detect_from_flags(_marker_flags(paths))
+                assert _early_stop_result(paths) == (project_type, confidence, list(build_steps)), paths
+
+
+def test_analyze_project_type_on_checkout(tmp_path):
+    (tmp_path / "package.json").write_text("{}")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "App.tsx").write_text("")
+    (tmp_path / "node_modules" / "flask").mkdir(parents=True)
+
+    analyzer = RepoAnalyzer(llm_url="", work_dir=str(tmp_path))
+    analysis = analyzer.analyze_project_type(str(tmp_path))
+
+    assert analysis == {
+        "project_type": "node_service",
+        "confidence": 0.9,
+        "build_steps": ["npm install", "npm test", "npm build"],
+    }
+
+
+def _scan(chunks):
+    scanner = _JSONObjectScanner()
+    for chunk in chunks:
+        if scanner.feed(chunk):
+            return True, scanner.result()
+    return False, scanner.result()
+
+
+def test_scanner_stops_at_the_end_of_the_first_object():
+    done, text = _scan(['Here you go: {"a": {"b": 1}', ', "c": [1, 2]}', ' trailing text {"d": 2}'])
+    assert done
+    assert text == 'Here you go: {"a": {"b": 1}, "c": [1, 2]}'
+
+
+def test_scanner_ignores_braces_and_escaped_quotes_in_strings():
+    done, text = _scan(['{"steps": ["echo }", "say \\"{\\""', '], "x": "\\\\"}', "extra"])
+    assert done
+    assert text == '{"steps": ["echo }", "say \\"{\\""], "x": "\\\\"}'
+
+
+def test_scanner_handles_objects_split_across_single_characters():
+    source = '{"project_type": "python", "n": {"m": "}"}} ignored'
+    done, text = _scan(list(source))
+    assert done
+    assert text == '{"project_type": "python", "n": {"m": "}"}}'
+
+
+def test_scanner_reports_incomplete_object():
+    done, text = _scan(['{"a": ', '"b}"'])
+    assert not done
+    assert text == '{"a": "b}"'
+
+
+def _git(*args, cwd):
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True,
+                   env=dict(os.environ, GIT_AUTHOR_NAME="t", GIT_AUTHOR_EMAIL="t@t",
+                            GIT_COMMITTER_NAME="t", GIT_COMMITTER_EMAIL="t@t"))
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+def test_analyze_async_ignores_directory_entries(tmp_path):
+    source = tmp_path / "source"
+    (source / "pom.xml").mkdir(parents=True)
+    (source / "pom.xml" / "README.md").write_text("not a Maven project\n")
+    (source / "index.html").write_text("<html></html>\n")
+    _git("init", "-q", "-b", "main", cwd=source)
+    _git("add", ".", cwd=source)
+    _git("commit", "-q", "-m", "init", cwd=source)
+
+    analyzer = RepoAnalyzer(llm_url="", work_dir=str(tmp_path / "work"))
+    analysis = asyncio.run(analyzer.analyze_async(f"file://{source}", "main"))
+    analyzer.wait_for_cleanups()
+
+    assert analysis == {"project_type": "website", "confidence": 0.7, "build_steps": ["npm install", "npm build"]}
+    assert os.listdir(tmp_path / "work") == []
@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+from agents.utils.singleflight import SingleFlight
+
+
+def _run_concurrently(flight, fn, followers=3):
+    """
+    Starts a leader call, then followers once the leader is inside fn.
+    Returns the outcome of every call as ("ok", result) or ("error", exception).
+    """
+    entered = threading.Event()
+    release = threading.Event()
+    outcomes = []
+    outcomes_lock = threading.Lock()
+
+    def leader_fn():
+        entered.set()
+        release.wait(5)
+        return fn()
+
+    def call(target):
+        try:
+            outcome = ("ok", flight.do("key", target))
+        except Exception as e:
+            outcome = ("error", e)
+        with outcomes_lock:
+            outcomes.append(outcome)
+
+    threads = [threading.Thread(target=call, args=(leader_fn,))]
+    threads[0].start()
+    assert entered.wait(5)
+
+    threads += [threading.Thread(target=call, args=(fn,)) for _ in range(followers)]
+    for thread in threads[1:]:
+        thread.start()
+    # Followers are blocked on the leader until it is released
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_callers_share_one_execution():
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return "result"
+
+    outcomes = _run_concurrently(SingleFlight(), fn)
+
+    assert outcomes == [("ok", "result")] * 4
+    assert len(calls) == 1
+
+
+def test_concurrent_callers_share_the_exception():
+    error = ValueError("failed")
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise error
+
+    outcomes = _run_concurrently(SingleFlight(), fn)
+
+    assert len(outcomes) == 4
+    assert all(kind == "error" and raised is error for kind, raised in outcomes)
+    assert len(calls) == 1
+
+
+def test_key_is_released_after_the_call():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("key", lambda: (_ for _ in ()).throw(ValueError("failed")))
+    assert flight.do("key", lambda: 2) == 2
+
+
+def test_follower_runs_fn_itself_after_wait_timeout():
+    flight = SingleFlight(wait_timeout=0.01)
+    release = threading.Event()
+    entered = threading.Event()
+
+    def slow():
+        entered.set()
+        release.wait(5)
+        return "leader"
+
+    leader = threading.Thread(target=flight.do, args=("key", slow))
+    leader.start()
+    assert entered.wait(5)
+    try:
+        assert flight.do("key", lambda: "follower") == "follower"
+    finally:
+        release.set()
+        leader.join(5)
@@ -0,0 +1,148 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("openai")
+
+from agents.deploy_agent import smol_deploy_agent
+from agents.deploy_agent.smol_deploy_agent import SmolDeployAgent, _INLINE_VALUES_MAX_LEAVES
+
+
+@pytest.fixture
+def agent():
+    return SmolDeployAgent(api_key="test")
+
+
+def test_prepare_values_passes_small_dicts_with_set_json(agent):
+    values_args, values_file = agent._prepare_values(
+        {"image": {"tag": "1.2", "pullPolicy": None}, "replicas": 2, "ports": [80, 443], "a.b": True}
+    )
+
+    assert values_file is None
+    assert values_args == [
+        "--set-json", 'image.tag="1.2"',
+        "--set-json", "image.pullPolicy=null",
+        "--set-json", "replicas=2",
+        "--set-json", "ports=[80, 443]",
+        "--set-json", "a\\.b=true",
+    ]
+
+
+def test_prepare_values_accepts_json_strings(agent):
+    assert agent._prepare_values('{"replicas": 3}') == (["--set-json", "replicas=3"], None)
+
+
+def test_prepare_values_treats_other_strings_as_set(agent):
+    assert agent._prepare_values("replicas=3,image.tag=v1") == (["--set", "replicas=3,image.tag=v1"], None)
+
+
+def test_prepare_values_passes_existing_files(agent, tmp_path):
+    path = tmp_path / "values.yaml"
+    path.write_text("replicas: 3\n")
+    assert agent._prepare_values(str(path)) == (["--values", str(path)], None)
+
+
+@pytest.mark.parametrize("helm_values", [None, "", {}, [1, 2]])
+def test_prepare_values_ignores_empty_or_unusable_values(agent, helm_values):
+    assert agent._prepare_values(helm_values) == ([], None)
+
+
+def test_prepare_values_writes_large_dicts_to_a_values_file(agent):
+    helm_values = {f"key{i}": {"value": i} for i in range(_INLINE_VALUES_MAX_LEAVES + 1)}
+    values_args, values_file = agent._prepare_values(helm_values)
+    try:
+        assert values_args == ["--values", values_file.name]
+        with open(values_file.name) as f:
+            content = f.read()
+        if smol_deploy_agent.yaml is not None:
+            assert smol_deploy_agent.yaml.safe_load(content) == helm_values
+        else:
+            assert json.loads(content) == helm_values
+    finally:
+        values_file.close()
+    assert not os.path.exists(values_file.name)
+
+
+def test_parse_commands_splits_strings_into_argv():
+    commands = SmolDeployAgent._parse_commands({
+        "install_chart": "helm upgrade --install app ./chart --set 'name=my app'",
+        "verify_deployment": ["kubectl", "get", "pods"],
+    })
+    assert commands == {
+        "install_chart": ["helm", "upgrade", "--install", "app", "./chart", "--set", "name=my app"],
+        "verify_deployment": ["kubectl", "get", "pods"],
+    }
+
+
+@pytest.mark.parametrize("commands", [
+    None,
+    {},
+    ["helm", "list"],
+    {"install_chart": ""},
+    {"install_chart": []},
+    {"install_chart": ["helm", 1]},
+    {"install_chart": "kubectl get ns | grep app"},
+    {"install_chart": "helm install app ./chart && rm -rf /"},
+])
+def test_parse_commands_rejects_malformed_or_shell_commands(commands):
+    assert SmolDeployAgent._parse_commands(commands) is None
+
+
+class _ConfigException(Exception):
+    pass
+
+
+class _FakeK8sConfig:
+    """
+    Stands in for kubernetes.config; every way of loading a configuration fails
+    """
+    ConfigException = _ConfigException
+    KUBE_CONFIG_DEFAULT_LOCATION = "/nonexistent/kubeconfig"
+
+    def __init__(self):
+        self.loaded = []
+
+    def load_incluster_config(self, client_configuration=None):
+        self.loaded.append("incluster")
+        raise _ConfigException("Service host/port is not set.")
+
+    def new_client_from_config(self, config_file=None, context=None):
+        self.loaded.append(("kubeconfig", config_file, context))
+        raise _ConfigException("Invalid kube-config file.")
+
+
+class _FakeK8sClient:
+    Configuration = dict
+
+
+@pytest.fixture
+def fake_k8s(monkeypatch):
+    k8s_config = _FakeK8sConfig()
+    monkeypatch.setattr(smol_deploy_agent, "k8s_client", _FakeK8sClient)
+    monkeypatch.setattr(smol_deploy_agent, "k8s_config", k8s_config)
+    monkeypatch.setattr(SmolDeployAgent, "_k8s_api_clients", {})
+    return k8s_config
+
+
+def test_verification_falls_back_to_helm_and_kubectl_without_api_config(agent, fake_k8s, monkeypatch):
+    checks = []
+
+    def run_deployment_checks(namespace, release_name, env, context):
+        checks.append((namespace, release_name))
+        return "STATUS: deployed", [{"name": "app-1", "status": "Running"}]
+
+    monkeypatch.setattr(agent, "_run_deployment_checks", run_deployment_checks)
+    result = agent._verify_deployment("prod", "app")
+
+    assert fake_k8s.loaded == ["incluster"]
+    assert checks == [("prod", "app")]
+    assert result["status"] == "success"
+    assert result["helm_status"] == "STATUS: deployed"
+
+
+def test_explicit_kubeconfig_does_not_use_the_service_account(agent, fake_k8s, monkeypatch):
+    monkeypatch.setattr(agent, "_run_deployment_checks", lambda *args: ("", []))
+    agent._verify_deployment("prod", "app", env={"KUBECONFIG": "/tmp/config"}, context="staging")
+
+    assert fake_k8s.loaded == [("kubeconfig", "/tmp/config", "staging")]
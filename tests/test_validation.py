@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from agents.utils.validation import RequestValidator, RequiredFields, fastjsonschema
+
+_FIELD_TYPES = (
+    ('ports', list, "ports must be a list"),
+    ('values', (dict, str), "values must be a dictionary or a string"),
+)
+
+
+def _random_requests(count=500):
+    rng = random.Random(0)
+    values = [None, "s", 1, [1], {"a": 1}]
+    fields = ['name', 'namespace', 'ports', 'values', 'other']
+    requests = [None, [], {}, {"parameters": []}, {"parameters": None}]
+    for _ in range(count):
+        chosen = rng.sample(fields, rng.randint(0, len(fields)))
+        requests.append({"parameters": {field: rng.choice(values) for field in chosen}})
+    return requests
+
+
+def test_first_missing_field_is_reported():
+    validate = RequestValidator(RequiredFields('name', 'namespace'))
+    assert validate({"parameters": {}}) == (False, "Missing required field: name")
+
+
+def test_every_missing_field_is_reported():
+    validate = RequestValidator(RequiredFields('name', 'namespace'), report_all_missing=True)
+    assert validate({"parameters": {}}) == (False, "Missing required fields: name, namespace")
+
+
+def test_field_types_are_checked_in_order():
+    validate = RequestValidator(RequiredFields('name'), _FIELD_TYPES)
+    assert validate({"parameters": {"name": "a", "values": 1, "ports": {}}}) == (False, "ports must be a list")
+    assert validate({"parameters": {"name": "a", "values": "v.yaml"}}) == (True, None)
+
+
+@pytest.mark.skipif(fastjsonschema is None, reason="fastjsonschema not installed")
+def test_schema_accepts_exactly_what_the_checks_accept():
+    validate = RequestValidator(RequiredFields('name', 'namespace'), _FIELD_TYPES)
+    without_schema = RequestValidator(RequiredFields('name', 'namespace'), _FIELD_TYPES)
+    without_schema._is_valid = None
+
+    for request in _random_requests():
+        assert validate._is_valid(request) == without_schema(request)[0], request
+        assert validate(request) == without_schema(request), request
+
+
+def test_required_fields_report_missing_names_in_declaration_order():
+    required = RequiredFields('name', 'namespace', 'chart')
+    assert required.missing({'name': 'a', 'namespace': 'b', 'chart': 'c'}) == []
+    assert required.missing({'namespace': 'b'}) == ['name', 'chart']